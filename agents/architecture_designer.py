@@ -1,6 +1,7 @@
 from models.app_state import AppGenerationState
 from services.groq_client import GroqClient
 from services.anthropic_client import AnthropicClient
+from services.architecture_library import lookup_architecture, feature_signature
 from config import AgentConfig
 import json
 
@@ -25,6 +26,15 @@ class ArchitectureDesignerAgent:
             # Get structured requirements from previous step
             requirements = state['structured_requirements']
             
+            if AgentConfig.ARCHITECTURE_LIBRARY_ENABLED:
+                # Every plan boils down to one main.dart plus pinned dependencies, so no LLM call is needed
+                architecture = lookup_architecture(requirements)
+                state['flutter_structure'] = architecture
+                state['current_agent'] = 'project_creator'
+                state['progress'] = 50
+                print(f"✅ Architecture served from library for signature {feature_signature(requirements)}")
+                return state
+            
             # Call AI service to design architecture
             raw_response = self.ai_client.design_architecture(requirements)
             print(raw_response)
@@ -1,14 +1,91 @@
 import os
-import subprocess
-import json
 import tempfile
+import shutil
 import re
-from xml.etree import ElementTree as ET
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from models.app_state import AppGenerationState
+from config import BuildConfig, JobConfig
+from services.skeleton_cache import skeleton_cache
+from services.config_planner import config_planner
+from services.flutter_tools import run_flutter, ensure_dependencies
+from services.metrics import metrics
 
 class ProjectCreatorAgent:
     def __init__(self):
-        pass
+        # Speculative scaffolds keyed by session id, started before the app name is known
+        self._scaffolds = {}
+        self._scaffold_lock = threading.Lock()
+        self._scaffold_executor = ThreadPoolExecutor(max_workers=JobConfig.JOB_WORKERS,
+                                                     thread_name_prefix='scaffold')
+    
+    def start_scaffold(self, state: AppGenerationState) -> dict:
+        """Workflow node: begin scaffolding under a provisional name and return immediately."""
+        if not BuildConfig.SPECULATIVE_SCAFFOLD_ENABLED or state.get('project_path'):
+            return {}
+        session_id = state['session_id']
+        provisional_name = self._provisional_name(session_id)
+        # Not bounded by the build slots: project_creator holds one while it waits on this future
+        context = contextvars.copy_context()
+        future = self._scaffold_executor.submit(context.run, self._scaffold, session_id, provisional_name)
+        with self._scaffold_lock:
+            self._scaffolds[session_id] = (provisional_name, future)
+        print(f"🚧 Speculative scaffolding started as '{provisional_name}'")
+        return {}
+    
+    def discard_scaffold(self, session_id: str):
+        """Drop a scaffold the workflow never adopted (failed run or cached artifact)."""
+        with self._scaffold_lock:
+            entry = self._scaffolds.pop(session_id, None)
+        if entry is None:
+            return
+        _, future = entry
+        if not future.cancel():
+            future.add_done_callback(self._remove_scaffold)
+    
+    def _remove_scaffold(self, future):
+        if not future.cancelled() and future.exception() is None:
+            temp_dir, _ = future.result()
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    
+    def _provisional_name(self, session_id: str) -> str:
+        return self._sanitize_app_name(f"app_{session_id[:8]}")
+    
+    @metrics.timed('speculative_scaffold')
+    def _scaffold(self, session_id: str, provisional_name: str):
+        temp_dir = tempfile.mkdtemp(prefix=f'flutter_app_{session_id}_')
+        project_path = os.path.join(temp_dir, provisional_name)
+        try:
+            self._create_flutter_project(provisional_name, project_path, temp_dir)
+            # Every generated app is a BLE app, so the core packages can be resolved up front
+            config_planner.apply(project_path, config_planner.plan(provisional_name, {}))
+            self._run_pub_get(project_path)
+        except Exception:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
+        return temp_dir, project_path
+    
+    def _adopt_scaffold(self, session_id: str, app_name: str):
+        """Wait for the speculative scaffold and rename it; None means build from scratch."""
+        with self._scaffold_lock:
+            entry = self._scaffolds.pop(session_id, None)
+        if entry is None:
+            return None
+        provisional_name, future = entry
+        try:
+            temp_dir, provisional_path = future.result()
+        except Exception as e:
+            print(f"⚠️ Speculative scaffold failed, creating the project directly: {e}")
+            return None
+        try:
+            project_path = skeleton_cache.rename(provisional_path, provisional_name, app_name)
+        except Exception as e:
+            print(f"⚠️ Could not rename speculative scaffold, creating the project directly: {e}")
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            return None
+        print(f"♻️ Adopted speculative scaffold '{provisional_name}' as '{app_name}'")
+        return temp_dir, project_path
     
     def process(self, state: AppGenerationState) -> AppGenerationState:
         """Create Flutter project structure with all fixes applied."""
@@ -21,27 +98,33 @@ class ProjectCreatorAgent:
             
             app_name = self._sanitize_app_name(app_name)
             
-            temp_dir = tempfile.mkdtemp(prefix=f'flutter_app_{state["session_id"]}_')
-            project_path = os.path.join(temp_dir, app_name)
-            
-            print(f"Project will be created at: {project_path}")
-            
-            self._create_flutter_project(app_name, project_path, temp_dir)
-            
-            self._update_pubspec(project_path, architecture.get('dependencies', {}), 
-                        architecture.get('dev_dependencies', {}), app_name, requirements)
+            existing_path = state.get('project_path')
+            scaffold = None if existing_path else self._adopt_scaffold(state['session_id'], app_name)
+            if existing_path and os.path.isdir(existing_path):
+                # Regenerating: keep the retained project (and its build outputs) and only rename it
+                temp_dir = state['temp_dir']
+                project_path = skeleton_cache.rename(existing_path, os.path.basename(existing_path), app_name)
+                print(f"♻️ Reusing retained project at {project_path}")
+            elif scaffold:
+                temp_dir, project_path = scaffold
+            else:
+                temp_dir = tempfile.mkdtemp(prefix=f'flutter_app_{state["session_id"]}_')
+                project_path = os.path.join(temp_dir, app_name)
+                
+                print(f"Project will be created at: {project_path}")
+                
+                self._create_flutter_project(app_name, project_path, temp_dir)
+            
+            # Final pubspec, manifest and Gradle state for every stage, written once here;
+            # the build stage re-applies the same plan and finds nothing left to change
+            config_plan = config_planner.plan(app_name, requirements)
+            config_planner.apply(project_path, config_plan)
             
             self._run_pub_get(project_path)
             
             self._create_project_structure(project_path, architecture.get('project_structure', {}))
-            
-            # --- MODIFICATION ---
-            # The logic for adding permissions has been removed from this agent.
-            # It will now be handled correctly and automatically by the build agent and plugins.
-            self._fix_gradle_files(project_path)
-            print("Android configuration fixed.")
-            # --- END MODIFICATION ---
 
+            state['config_plan'] = config_plan
             state['project_path'] = project_path
             state['temp_dir'] = temp_dir
             state['current_agent'] = 'code_generator'
@@ -68,159 +151,50 @@ class ProjectCreatorAgent:
         return sanitized
     
     def _create_flutter_project(self, app_name: str, project_path: str, temp_dir: str):
-        command = [
-            'flutter', 'create', 
+        if BuildConfig.SKELETON_CACHE_ENABLED:
+            try:
+                skeleton_cache.clone(app_name, project_path)
+                print("Base Flutter project cloned from skeleton cache")
+                return
+            except Exception as e:
+                print(f"⚠️ Skeleton cache unavailable, falling back to flutter create: {e}")
+                if os.path.exists(project_path):
+                    shutil.rmtree(project_path, ignore_errors=True)
+
+        args = [
+            'create',
             '--project-name', app_name,
-            '--platforms', 'android',
-            '--android-language', 'kotlin',
+            '--platforms', BuildConfig.PROJECT_PLATFORMS,
+            '--android-language', BuildConfig.ANDROID_LANGUAGE,
             project_path
         ]
-        print(f"Running: {' '.join(command)}")
-        result = subprocess.run(command, capture_output=True, text=True, cwd=temp_dir, timeout=120, shell=True)
+        print(f"Running: flutter {' '.join(args)}")
+        result = run_flutter(args, cwd=temp_dir, timeout=120)
         if result.returncode != 0:
-            raise Exception(f"Flutter create failed: {result.stderr}")
+            raise Exception(f"Flutter create failed: {result.stdout}")
         print("Base Flutter project created successfully")
     
-    def _update_pubspec(self, project_path: str, dependencies: dict, dev_dependencies: dict, app_name: str, requirements: dict):
-        """
-        Update pubspec.yaml and FORCE the use of modern, stable packages
-        to prevent all build failures.
-        """
-        pubspec_path = os.path.join(project_path, 'pubspec.yaml')
-        
-        try:
-            print("\n--- Updating pubspec.yaml with definitive package fixes ---")
-            
-            app_requirements_text = str(requirements).lower()
-            ui_components = requirements.get('ui_components', [])
-
-            # --- Definitive Bluetooth Fix ---
-            if 'flutter_bluetooth_serial' in dependencies:
-                print("Found and removed problematic 'flutter_bluetooth_serial' package.")
-                del dependencies['flutter_bluetooth_serial']
-            
-            is_bluetooth_app = any(keyword in app_requirements_text for keyword in ['bluetooth', 'ble', 'hc-05', 'sensor'])
-            if is_bluetooth_app:
-                print("Bluetooth app detected. Forcing essential dependencies.")
-                dependencies['flutter_blue_plus'] = '^1.32.2'
-                dependencies['permission_handler'] = '^11.3.0'
-
-            # --- Dynamic Dependency for UI Components ---
-            if 'color_picker' in ui_components:
-                 print("Color picker UI detected. Adding `flutter_colorpicker` dependency.")
-                 dependencies['flutter_colorpicker'] = '^1.1.0'
-
-            # --- Remove known bad packages ---
-            bad_packages = ['line_graph', 'charts_flutter', 'graph_view', 'color_picker', 'slider']
-            for pkg in bad_packages:
-                if pkg in dependencies:
-                    print(f"Found and removed problematic package: {pkg}")
-                    del dependencies[pkg]
-
-            dependencies = self._filter_problematic_dependencies(dependencies, requirements)
-
-            # Build the final dependency list
-            final_deps = {
-                'flutter': {'sdk': 'flutter'},
-                'cupertino_icons': '^1.0.2',
-            }
-            final_deps.update(dependencies)
-
-            yaml_safe_name = self._sanitize_app_name(app_name)
-            lines = [
-                f"name: {yaml_safe_name}", "description: A Flutter application.",
-                "publish_to: 'none'", "version: 1.0.0+1", "",
-                "environment:", '  sdk: ">=3.2.0 <4.0.0"', "", "dependencies:"
-            ]
-            
-            for dep, version in final_deps.items():
-                if dep == 'flutter': continue
-                lines.append(f"  {dep}: {version}")
-            
-            lines.extend([
-                "", "dev_dependencies:", "  flutter_test:", "    sdk: flutter",
-                "  flutter_lints: ^3.0.0", "", "flutter:", "  uses-material-design: true"
-            ])
-            
-            with open(pubspec_path, 'w', encoding='utf-8') as f:
-                f.write('\n'.join(lines))
-            
-            print(f"SUCCESS: pubspec.yaml updated with {len(final_deps)} stable dependencies.\n")
-            
-        except Exception as e:
-            raise Exception(f"Could not update pubspec.yaml: {e}")
-
-    def _is_bluetooth_app(self, dependencies: dict) -> bool:
-        ble_deps = ['flutter_blue_plus', 'flutter_bluetooth_serial', 'bluetooth']
-        for dep in dependencies.keys():
-            if any(ble_dep in dep.lower() for ble_dep in ble_deps):
-                return True
-        return False
-
     def _run_pub_get(self, project_path: str):
-        try:
-            print("Running flutter pub get...")
-            result = subprocess.run(['flutter', 'pub', 'get'], cwd=project_path, capture_output=True, text=True, timeout=120, shell=True)
-            if result.returncode != 0:
-                raise Exception(f"Flutter pub get failed:\n{result.stderr}")
-            print("Dependencies downloaded successfully")
-        except Exception as e:
-            raise e
+        print("Running flutter pub get...")
+        ensure_dependencies(project_path)
 
     def _create_project_structure(self, project_path: str, project_structure: dict):
-        if 'lib' in project_structure:
-            lib_path = os.path.join(project_path, 'lib')
-            self._create_recursive_structure(project_path, {'lib': project_structure['lib']})
-        print("Project structure and empty files created")
+        # The code generator writes lib/main.dart itself and nothing reads the other planned
+        # files, so placeholders are only counted, never written
+        planned = self._planned_files(project_structure.get('lib', {}), 'lib')
+        skipped = [path for path in planned if path != 'lib/main.dart']
+        os.makedirs(os.path.join(project_path, 'lib'), exist_ok=True)
+        print(f"Project structure ready ({len(skipped)} unused placeholder files skipped)")
 
-    def _create_recursive_structure(self, base_path: str, structure: dict):
+    def _planned_files(self, structure: dict, prefix: str) -> list:
+        files = []
         for name, content in structure.items():
-            current_path = os.path.join(base_path, name)
+            path = f"{prefix}/{name}"
             if isinstance(content, dict):
-                os.makedirs(current_path, exist_ok=True)
-                self._create_recursive_structure(current_path, content)
-            elif '/lib/' in current_path.replace('\\', '/'):
-                os.makedirs(os.path.dirname(current_path), exist_ok=True)
-                if current_path.endswith('.dart') and (name != 'main.dart' or not os.path.exists(current_path)):
-                    with open(current_path, 'w', encoding='utf-8') as f:
-                        f.write(f"// {content}\n// TODO: Implement {name}\n\n")
-    
-    def _fix_gradle_files(self, project_path: str):
-        app_gradle_path = os.path.join(project_path, 'android/app/build.gradle')
-        if os.path.exists(app_gradle_path):
-            with open(app_gradle_path, 'r', encoding='utf-8') as f: content = f.read()
-            content = re.sub(r'compileSdk .*', 'compileSdk 35', content)
-            content = re.sub(r'minSdkVersion .*', 'minSdkVersion 21', content)
-            content = re.sub(r'targetSdkVersion .*', 'targetSdkVersion 35', content)
-            with open(app_gradle_path, 'w', encoding='utf-8') as f: f.write(content)
+                files.extend(self._planned_files(content, path))
+            elif name.endswith('.dart'):
+                files.append(path)
+        return files
     
     def _count_created_files(self, project_path: str) -> int:
         return sum(len(files) for root, dirs, files in os.walk(project_path))
-    
-    def _filter_problematic_dependencies(self, dependencies: dict, requirements: dict) -> dict:
-        """Remove dependencies that cause build conflicts."""
-        
-        app_requirements_text = str(requirements).lower()
-        is_bluetooth_app = any(keyword in app_requirements_text for keyword in ['bluetooth', 'ble', 'terminal', 'data'])
-        
-        problematic_packages = [
-            'connectivity_plus', 'network_info_plus', 'device_info_plus', 
-            'package_info_plus', 'shared_preferences_plus'
-        ]
-        
-        cleaned_deps = {}
-        for dep, version in dependencies.items():
-            if dep not in problematic_packages:
-                cleaned_deps[dep] = version
-            else:
-                print(f"Removed problematic dependency: {dep}")
-        
-        if is_bluetooth_app:
-            bluetooth_essentials = {
-                'flutter_blue_plus': '^1.32.2',
-                'permission_handler': '^11.3.0'
-            }
-            cleaned_deps.update(bluetooth_essentials)
-        
-        return cleaned_deps
-
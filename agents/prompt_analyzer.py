@@ -1,10 +1,35 @@
 from models.app_state import AppGenerationState
 from services.groq_client import GroqClient
 from services.anthropic_client import AnthropicClient
+from services.feature_extractor import extract_features
 from config import AgentConfig
 import json
 import re
 
+# Words that identify concrete hardware or controls; a prompt with none of them is ambiguous
+HARDWARE_WORDS = frozenset([
+    'relay', 'neopixel', 'neopixels', 'led', 'leds', 'light', 'lights', 'lamp', 'servo', 'motor', 'buzzer',
+    'laser', 'fan', 'pump', 'temperature', 'temp', 'thermal', 'humidity', 'humid', 'moisture', 'soil',
+    'dht11', 'dht22', 'ldr', 'distance', 'ultrasonic', 'proximity', 'motion', 'accelerometer',
+    'gyroscope', 'imu', 'joystick', 'sensor', 'sensors', 'button', 'buttons', 'slider', 'sliders',
+    'brightness', 'speed', 'rgb', 'color', 'colour', 'switch', 'toggle',
+])
+
+# Words the local analysis understands without changing its result
+KNOWN_WORDS = HARDWARE_WORDS | frozenset([
+    'app', 'application', 'bluetooth', 'ble', 'hc', '05', 'esp32', 'arduino', 'device', 'devices', 'control',
+    'controller', 'controls', 'controlling', 'on', 'off', 'turn', 'monitor', 'monitoring', 'display',
+    'show', 'shows', 'read', 'reading', 'readings', 'data', 'level', 'adjust', 'value', 'values', 'strip',
+    'send', 'sends', 'receive', 'simple', 'basic', 'dashboard', 'station', 'real', 'time', 'live',
+    'mobile', 'phone', 'android', 'flutter', 'remote', 'smart', 'home', 'board', 'module',
+])
+
+STOPWORDS = frozenset([
+    'a', 'an', 'the', 'and', 'or', 'for', 'to', 'of', 'with', 'that', 'this', 'my', 'me', 'i', 'it',
+    'in', 'from', 'by', 'using', 'use', 'can', 'should', 'want', 'need', 'please', 'create', 'make',
+    'build', 'generate', 'which', 'will', 'be', 'is', 'are', 'has', 'have', 'its', 'also', 'both',
+])
+
 class PromptAnalyzerAgent:
     def __init__(self):
         # Initialize the appropriate client based on configuration
@@ -20,6 +45,17 @@ class PromptAnalyzerAgent:
         raw_response = ""
         json_str = ""
 
+        if AgentConfig.ANALYZER_LOCAL_MODE:
+            local_requirements = self._intelligent_bluetooth_analysis(state['user_prompt'])
+            confidence = self._local_confidence(state['user_prompt'])
+            if confidence >= AgentConfig.ANALYZER_CONFIDENCE_THRESHOLD:
+                print(f"⚡ Local analysis confident ({confidence:.2f}), skipping {self.service_name.upper()} call")
+                state['structured_requirements'] = local_requirements
+                state['current_agent'] = 'architecture_designer'
+                state['progress'] = 20
+                return state
+            print(f"🤔 Local analysis confidence {confidence:.2f} below threshold, escalating to {self.service_name.upper()}")
+
         try:
             print(f"🔍 Advanced Bluetooth App Analysis using {self.service_name.upper()}: {state['user_prompt'][:100]}...")
 
@@ -52,6 +88,21 @@ class PromptAnalyzerAgent:
 
         return state
 
+    def _local_confidence(self, prompt: str) -> float:
+        """Score in [0, 1] for how completely the keyword analysis explains the prompt."""
+
+        words = [w for w in re.findall(r'[a-z0-9]+', prompt.lower()) if w not in STOPWORDS]
+        if not words or not any(w in HARDWARE_WORDS for w in words):
+            return 0.0
+
+        coverage = sum(1 for w in words if w in KNOWN_WORDS) / len(words)
+
+        # Long free-form descriptions tend to carry requirements keywords cannot capture
+        if len(words) > 40:
+            coverage *= 0.8
+
+        return coverage
+
     def _enhance_bluetooth_prompt(self, user_prompt: str) -> str:
         """Enhance prompt with Bluetooth-specific context."""
 
@@ -138,25 +189,19 @@ class PromptAnalyzerAgent:
             if feature not in enhanced['features']:
                 enhanced['features'].append(feature)
 
-        # Detect sensor types from prompt
-        sensor_types = []
-        prompt_lower = prompt.lower()
+        # Detect sensor and control types from prompt (same FeatureSet the code generator uses)
+        features = extract_features(prompt)
+        sensor_types = features.sensor_types
 
-        if any(word in prompt_lower for word in ['temp', 'temperature', 'thermal']):
-            sensor_types.append('temperature')
+        if features.has_temperature or features.has_humidity:
             if 'sensor_data_parsing' not in enhanced['features']:
                 enhanced['features'].append('sensor_data_parsing')
 
-        if any(word in prompt_lower for word in ['humidity', 'humid', 'moisture']):
-            sensor_types.append('humidity')
-            if 'sensor_data_parsing' not in enhanced['features']:
-                enhanced['features'].append('sensor_data_parsing')
-
-        if any(word in prompt_lower for word in ['sensor', 'data', 'reading']):
-            sensor_types.append('general_sensor')
+        if features.has_general_sensor:
             enhanced['features'].extend(['real_time_updates', 'data_monitoring'])
 
         enhanced['sensor_types'] = sensor_types
+        enhanced['devices'] = list(features.devices)
 
         # Enhanced UI components
         if 'ui_components' not in enhanced:
@@ -174,14 +219,12 @@ class PromptAnalyzerAgent:
                 enhanced['ui_components'].append('sensor_displays')
 
         # Detect control types
-        control_types = []
-        if any(word in prompt_lower for word in ['button', 'on', 'off', 'control', 'switch']):
-            control_types.append('buttons')
+        control_types = features.control_types
+        if features.has_buttons:
             if 'control_buttons' not in enhanced['ui_components']:
                 enhanced['ui_components'].append('control_buttons')
 
-        if any(word in prompt_lower for word in ['slider', 'brightness', 'level', 'adjust']):
-            control_types.append('sliders')
+        if features.has_sliders:
             if 'sliders' not in enhanced['ui_components']:
                 enhanced['ui_components'].append('sliders')
 
@@ -196,7 +239,7 @@ class PromptAnalyzerAgent:
     def _intelligent_bluetooth_analysis(self, prompt: str) -> dict:
         """Create comprehensive Bluetooth app requirements from prompt analysis."""
 
-        prompt_lower = prompt.lower()
+        features = extract_features(prompt)
 
         # Base Bluetooth app structure
         requirements = {
@@ -214,34 +257,30 @@ class PromptAnalyzerAgent:
                 "control_buttons"
             ],
             "sensor_types": [],
-            "control_types": [],
+            "control_types": features.control_types,
+            "devices": list(features.devices),
             "color_theme": "gradient_blue_purple",
             "complexity": "professional"
         }
 
         # Detect specific features from prompt
-        if any(word in prompt_lower for word in ['temp', 'temperature']):
+        if features.has_temperature:
             requirements['sensor_types'].append('temperature')
             requirements['features'].append('sensor_data_parsing')
             if 'sensor_displays' not in requirements['ui_components']:
                 requirements['ui_components'].append('sensor_displays')
 
-        if any(word in prompt_lower for word in ['humidity', 'humid', 'moisture']):
+        if features.has_humidity:
             requirements['sensor_types'].append('humidity')
             requirements['features'].append('sensor_data_parsing')
             if 'sensor_displays' not in requirements['ui_components']:
                 requirements['ui_components'].append('sensor_displays')
 
-        if any(word in prompt_lower for word in ['neopixel', 'led', 'light']):
+        if features.mentions_neopixel:
             requirements['app_name'] = "Neopixel Bluetooth Controller"
             requirements['description'] = "Professional Neopixel control via Bluetooth"
-            requirements['control_types'].append('buttons')
-
-        if any(word in prompt_lower for word in ['button', 'on', 'off']):
-            requirements['control_types'].append('buttons')
 
-        if any(word in prompt_lower for word in ['slider', 'brightness', 'level']):
-            requirements['control_types'].append('sliders')
+        if features.has_sliders:
             if 'sliders' not in requirements['ui_components']:
                 requirements['ui_components'].append('sliders')
 
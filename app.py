@@ -4,22 +4,41 @@ import glob
 import shutil
 import tempfile
 import re
-from flask import Flask, request, render_template, jsonify, send_file, redirect, url_for
+import json
+import hashlib
+from flask import Flask, request, render_template, jsonify, send_file, redirect, url_for, Response, stream_with_context
 from langgraph.graph import StateGraph, START, END
 from models.app_state import AppGenerationState
+from config import DownloadConfig, HostConfig
 from agents.prompt_analyzer import PromptAnalyzerAgent
 from agents.architecture_designer import ArchitectureDesignerAgent
 from agents.project_creator import ProjectCreatorAgent
 from agents.code_generator import CodeGeneratorAgent
 from agents.build_automator import BuildAutomatorAgent
+from services.workspace_pool import workspace_pool
+from services.dependency_mirror import dependency_mirror
+from services.job_scheduler import job_scheduler, QueueFullError
+from services.progress_events import progress_broker
+from services.process_runner import process_runner
+from services.build_executor import build_executor
+from services.artifact_store import artifact_store
+from services.host_address import host_address
+from services.apk_variants import UNIVERSAL, choose_variant, requested_abi
+from services.session_store import session_store
+from services.metrics import metrics
+from services.llm_cache import llm_cache
+from services.dart_fixes import smart_api_fixes, bulletproof_fixes
 import qrcode
-import io
-import base64
-import socket
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here'
-session_states = {}
+# Flask's send_file then emits X-Sendfile and leaves the bytes to the front proxy
+app.config['USE_X_SENDFILE'] = DownloadConfig.DOWNLOAD_OFFLOAD == 'x-sendfile'
+
+APK_MIMETYPE = 'application/vnd.android.package-archive'
+ABI_CLIENT_HINTS = ('Sec-CH-UA-Arch', 'Sec-CH-UA-Bitness')
+# Build output lines returned with each progress poll, for clients without Server-Sent Events
+PROGRESS_LOG_TAIL = 50
 
 def cleanup_old_builds():
     """Finds and removes leftover temporary build directories from previous runs."""
@@ -47,17 +66,59 @@ project_creator = ProjectCreatorAgent()
 code_generator = CodeGeneratorAgent()
 build_automator = BuildAutomatorAgent()
 
+# State keys each stage reads; a stage whose inputs hash the same as last run is skipped
+STAGE_INPUTS = {
+    'prompt_analyzer': ('user_prompt',),
+    'architecture_designer': ('structured_requirements',),
+    'project_creator': ('flutter_structure', 'structured_requirements'),
+    'code_generator': ('structured_requirements', 'user_prompt', 'hardware_commands'),
+}
+
+def stage_fingerprint(stage, state):
+    inputs = [state.get(key) for key in STAGE_INPUTS[stage]]
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def skip_unchanged(stage, node):
+    """Wrap a node so regenerations only rerun it when its inputs changed."""
+    def run(state):
+        fingerprint = stage_fingerprint(stage, state)
+        if state.get('stage_fingerprints', {}).get(stage) == fingerprint:
+            print(f"⏭️ {stage} inputs unchanged, skipping")
+            return {}
+        result = node(state)
+        if result.get('current_agent') != 'error':
+            result['stage_fingerprints'] = dict(state.get('stage_fingerprints') or {}, **{stage: fingerprint})
+        return result
+    return run
+
+def timed_stage(stage, node):
+    """Record a timing span for every run of a node, including time spent waiting for a slot."""
+    def run(state):
+        with metrics.span(stage, 'stage', state.get('session_id')) as outcome:
+            result = node(state)
+            outcome['ok'] = result.get('current_agent') != 'error'
+            return result
+    return run
+
 def create_workflow():
     """Create a LangGraph workflow with robust conditional error handling."""
     workflow = StateGraph(AppGenerationState)
-    workflow.add_node("prompt_analyzer", prompt_analyzer.process)
-    workflow.add_node("architecture_designer", architecture_designer.process)
-    workflow.add_node("project_creator", project_creator.process)
-    workflow.add_node("code_generator", code_generator.process)
-    workflow.add_node("build_automator", build_automator.process)
+    # LLM-bound stages get many slots, CPU/RAM-heavy tooling stages only a few; Gradle itself is admitted by the build executor
+    workflow.add_node("prompt_analyzer", timed_stage('prompt_analyzer', skip_unchanged('prompt_analyzer', job_scheduler.limit('llm', prompt_analyzer.process))))
+    workflow.add_node("architecture_designer", timed_stage('architecture_designer', skip_unchanged('architecture_designer', job_scheduler.limit('llm', architecture_designer.process))))
+    workflow.add_node("project_creator", timed_stage('project_creator', skip_unchanged('project_creator', job_scheduler.limit('build', project_creator.process))))
+    workflow.add_node("code_generator", timed_stage('code_generator', skip_unchanged('code_generator', code_generator.process)))
+    workflow.add_node("build_automator", timed_stage('build_automator', build_automator.process))
+    workflow.add_node("artifact_cache", timed_stage('artifact_cache', build_automator.serve_cached_artifact))
+    workflow.add_node("project_scaffolder", timed_stage('project_scaffolder', project_creator.start_scaffold))
     workflow.add_edge(START, "prompt_analyzer")
+    # Fan out: scaffolding and pub get overlap the analysis; project_creator adopts the result
+    workflow.add_edge(START, "project_scaffolder")
+    workflow.add_edge("project_scaffolder", END)
     workflow.add_conditional_edges("prompt_analyzer", lambda state: "architecture_designer" if state.get('current_agent') != 'error' else END)
-    workflow.add_conditional_edges("architecture_designer", lambda state: "project_creator" if state.get('current_agent') != 'error' else END)
+    workflow.add_conditional_edges("architecture_designer", lambda state: "artifact_cache" if state.get('current_agent') != 'error' else END)
+    # A plan that was already built is served straight from the APK cache
+    workflow.add_conditional_edges("artifact_cache", lambda state: "project_creator" if state.get('current_agent') not in ('error', 'completed') else END)
     workflow.add_conditional_edges("project_creator", lambda state: "code_generator" if state.get('current_agent') != 'error' else END)
     workflow.add_conditional_edges("code_generator", lambda state: "build_automator" if state.get('current_agent') != 'error' else END)
     workflow.add_edge("build_automator", END)
@@ -92,48 +153,179 @@ def generate_app():
         error_log=[],
         session_id=session_id,
         project_path=None,
-        temp_dir=None
+        temp_dir=None,
+        artifact_plan_key=None,
+        stage_fingerprints={},
+        code_provenance=None,
+        config_plan=None
     )
-    session_states[session_id] = initial_state
+    session_store.create(session_id, initial_state)
     return redirect(url_for('progress', session_id=session_id))
 
 @app.route('/progress/<session_id>')
 def progress(session_id):
-    if session_id not in session_states:
+    if not session_store.exists(session_id):
         return redirect(url_for('index'))
     return render_template('progress.html', session_id=session_id)
 
-@app.route('/api/progress/<session_id>')
-def api_progress(session_id):
-    state = session_states.get(session_id)
-    if not state:
-        return jsonify({'error': 'Session not found'}), 404
-    return jsonify({
+def progress_snapshot(state):
+    return {
         'progress': state.get('progress'),
         'current_agent': state.get('current_agent'),
         'build_status': state.get('build_status'),
         'errors': state.get('error_log'),
         'apk_ready': state.get('apk_path') is not None,
-    })
+    }
+
+@app.route('/api/progress/<session_id>')
+def api_progress(session_id):
+    state = session_store.get(session_id, include_blobs=False)
+    if not state:
+        return jsonify({'error': 'Session not found'}), 404
+    # Empty when the job runs in another worker process; the buffer is per process
+    return jsonify(dict(progress_snapshot(state), log=process_runner.tail(session_id, PROGRESS_LOG_TAIL)))
+
+@app.route('/api/metrics')
+def api_metrics():
+    """Span histograms with p50/p95/p99 as JSON, or Prometheus text with ?format=prometheus."""
+    wants_text = 'text/plain' in request.headers.get('Accept', '') and 'json' not in request.headers.get('Accept', '')
+    if request.args.get('format') == 'prometheus' or (wants_text and request.args.get('format') != 'json'):
+        return Response(metrics.prometheus(), mimetype='text/plain; version=0.0.4')
+    rewrites = {engine.name: engine.stats() for engine in (smart_api_fixes, bulletproof_fixes)}
+    return jsonify(dict(metrics.snapshot(), builds=build_executor.status(), llm_cache=llm_cache.stats(),
+                        rewrites=rewrites))
+
+@app.route('/api/metrics/<session_id>')
+def api_session_metrics(session_id):
+    spans = metrics.session_spans(session_id)
+    if spans is None:
+        return jsonify({'error': 'No spans recorded for this session'}), 404
+    return jsonify({'session_id': session_id, 'spans': spans})
+
+@app.route('/api/progress/<session_id>/stream')
+def api_progress_stream(session_id):
+    """Server-Sent Events feed of stage transitions and build log lines."""
+    state = session_store.get(session_id, include_blobs=False)
+    if not state:
+        return jsonify({'error': 'Session not found'}), 404
+    last_event_id = int(request.headers.get('Last-Event-ID', 0) or 0)
+
+    def event_stream():
+        # The current snapshot first, so a late subscriber renders immediately
+        snapshot = progress_snapshot(state)
+        yield f"event: stage\ndata: {json.dumps(snapshot)}\n\n"
+        for item in progress_broker.listen(session_id, last_event_id, heartbeat=5.0):
+            if item is None:
+                # The job may be running in another worker process; fall back to the shared store
+                latest = progress_snapshot(session_store.get(session_id, include_blobs=False) or {})
+                if latest != snapshot:
+                    snapshot = latest
+                    yield f"event: stage\ndata: {json.dumps(snapshot)}\n\n"
+                if snapshot.get('build_status') in ('completed', 'failed'):
+                    yield f"event: done\ndata: {json.dumps(snapshot)}\n\n"
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            event_id, event, data = item
+            yield f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+    return Response(stream_with_context(event_stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def run_generation(session_id):
+    """Run the whole workflow for a session; executed on a scheduler worker thread."""
+    state = session_store.get(session_id)
+    try:
+        # Stream node by node so progress set by each agent is visible while the job runs
+        with metrics.session(session_id), metrics.span('generation', 'session'):
+            for chunk in workflow_app.stream(state, stream_mode="updates"):
+                for node_name, update in chunk.items():
+                    if update:
+                        state.update(update)
+                        session_store.update(session_id, update)
+                    progress_broker.publish(session_id, 'stage', dict(progress_snapshot(state), node=node_name))
+    except Exception as e:
+        state['error_log'].append(f"Workflow error: {str(e)}")
+        state['build_status'] = 'failed'
+        session_store.append_error(session_id, f"Workflow error: {str(e)}")
+        session_store.update(session_id, {'build_status': 'failed'})
+    finally:
+        project_creator.discard_scaffold(session_id)
+        # Nothing the session started may outlive it, e.g. a pub get under a discarded scaffold
+        process_runner.cancel(session_id)
+        progress_broker.publish(session_id, 'done', progress_snapshot(state))
+        progress_broker.close(session_id)
 
 @app.route('/api/start-generation/<session_id>', methods=['POST'])
 def start_generation(session_id):
-    if session_id not in session_states:
+    if not session_store.exists(session_id):
         return jsonify({'error': 'Session not found'}), 404
+    # Reloading the progress page must not start the same session twice, even from another worker
+    if not session_store.compare_and_set(session_id, 'build_status', 'pending', 'in_progress'):
+        return jsonify({'success': True, 'message': 'Generation already started'}), 202
     try:
-        final_state = workflow_app.invoke(session_states[session_id])
-        session_states[session_id] = final_state
-        return jsonify({'success': True, 'message': 'Generation completed'})
-    except Exception as e:
-        session_states[session_id]['error_log'].append(f"Workflow error: {str(e)}")
-        session_states[session_id]['build_status'] = 'failed'
-        return jsonify({'error': str(e)}), 500
+        job_scheduler.submit(session_id, run_generation, session_id)
+    except QueueFullError as e:
+        session_store.update(session_id, {'build_status': 'pending'})
+        response = jsonify({'error': 'Server is busy, please retry shortly', 'retry_after': e.retry_after})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+    return jsonify({'success': True, 'message': 'Generation started'}), 202
+
+@app.route('/api/regenerate/<session_id>', methods=['POST'])
+def regenerate(session_id):
+    """Rerun a finished session with an edited prompt, reusing its project and unchanged stages."""
+    state = session_store.get(session_id)
+    if not state:
+        return jsonify({'error': 'Session not found'}), 404
+
+    payload = request.get_json(silent=True) or request.form
+    changes = {}
+    if 'prompt' in payload:
+        changes['user_prompt'] = payload['prompt'].strip()
+    if 'hardware_commands' in payload:
+        changes['hardware_commands'] = payload['hardware_commands'].strip()
+    if not changes.get('user_prompt', state['user_prompt']):
+        return jsonify({'error': 'Please provide a prompt'}), 400
+
+    previous_status = state.get('build_status')
+    if previous_status not in ('completed', 'failed') or \
+            not session_store.compare_and_set(session_id, 'build_status', previous_status, 'in_progress'):
+        return jsonify({'error': 'Generation is still running'}), 409
+
+    changes.update(current_agent='prompt_analyzer', progress=0, error_log=[], apk_path=None)
+    if not state.get('project_path') or not os.path.isdir(state['project_path']):
+        # The retained project is gone (e.g. startup cleanup), so it has to be recreated and refilled
+        fingerprints = dict(state.get('stage_fingerprints') or {})
+        fingerprints.pop('project_creator', None)
+        fingerprints.pop('code_generator', None)
+        changes.update(project_path=None, temp_dir=None, stage_fingerprints=fingerprints)
+    session_store.update(session_id, changes)
+    progress_broker.reopen(session_id)
+    process_runner.clear(session_id)
+
+    try:
+        job_scheduler.submit(session_id, run_generation, session_id)
+    except QueueFullError as e:
+        session_store.update(session_id, dict({key: state.get(key) for key in changes}, build_status=previous_status))
+        response = jsonify({'error': 'Server is busy, please retry shortly', 'retry_after': e.retry_after})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+    return jsonify({'success': True, 'progress_url': url_for('progress', session_id=session_id)}), 202
 
 @app.route('/download/<session_id>')
 def download_apk(session_id):
-    state = session_states.get(session_id, {})
-    apk_path = state.get('apk_path')
-    
+    state = session_store.get(session_id) or {}
+    record = artifact_store.get(session_id) or {}
+    variants = record.get('variants', {})
+    # ?abi= overrides what the client hints or user agent say about the device
+    variant = choose_variant(variants, request.args.get('abi') or requested_abi(request.headers)) if variants else None
+    if variant and artifact_store.has_blob(variants[variant]):
+        # The blob never changes under its digest, so its SHA-256 is a strong validator
+        apk_path, etag = artifact_store.blob_path(variants[variant]), variants[variant]
+    else:
+        apk_path, etag = state.get('apk_path'), True
+
     if not apk_path or not os.path.exists(apk_path):
         return "APK not found.", 404
     
@@ -141,60 +333,88 @@ def download_apk(session_id):
     requirements = state.get('structured_requirements', {})
     app_name = requirements.get('app_name', 'bluetooth_app')
     clean_name = re.sub(r'[^a-zA-Z0-9_]', '_', app_name.lower())
-    download_name = f"{clean_name}.apk"
-        
-    return send_file(apk_path, as_attachment=True, download_name=download_name)
+    download_name = f"{clean_name}.apk" if variant in (None, UNIVERSAL) else f"{clean_name}-{variant}.apk"
+
+    # Downloads keep the artifact from being evicted under the output disk budget
+    artifact_store.touch(session_id)
+
+    if DownloadConfig.DOWNLOAD_OFFLOAD == 'x-accel-redirect' and etag is not True:
+        # nginx serves the bytes, including Range and If-Range, from its internal location
+        relative = os.path.relpath(apk_path, artifact_store.root).replace(os.sep, '/')
+        response = Response(mimetype=APK_MIMETYPE)
+        response.headers['X-Accel-Redirect'] = DownloadConfig.DOWNLOAD_ACCEL_PREFIX.rstrip('/') + '/' + relative
+        response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+        response.set_etag(etag)
+        response.last_modified = os.path.getmtime(apk_path)
+        # If-None-Match and If-Modified-Since are answered here with a 304, as send_file does
+        response = response.make_conditional(request)
+    else:
+        # conditional=True answers Range with 206, If-Range, If-None-Match and If-Modified-Since. Full 200
+        # responses go through the WSGI server's file wrapper (gunicorn uses sendfile(2)); Werkzeug slices
+        # 206 responses in Python, so set DOWNLOAD_OFFLOAD to have the proxy serve ranges too
+        response = send_file(apk_path, mimetype=APK_MIMETYPE, as_attachment=True, download_name=download_name,
+                             etag=etag, conditional=True)
+    if len(variants) > 1:
+        response.vary.update(('User-Agent',) + ABI_CLIENT_HINTS)
+    return response
+
+
+@app.route('/qr/<session_id>.png')
+def session_qr(session_id):
+    """QR code of the session's download link, rendered once and kept next to its artifact."""
+    state = session_store.get(session_id) or {}
+    if not artifact_store.get(session_id) and not (state.get('apk_path') and os.path.exists(state['apk_path'])):
+        return "APK not found.", 404
+
+    qr_path = artifact_store.qr_path(session_id)
+    if not os.path.exists(qr_path):
+        download_url = host_address.base_url() + url_for('download_apk', session_id=session_id)
+        qr = qrcode.QRCode(version=1, box_size=10, border=5)
+        qr.add_data(download_url)
+        qr.make(fit=True)
+        os.makedirs(os.path.dirname(qr_path), exist_ok=True)
+        staging_path = f"{qr_path}.{uuid.uuid4().hex}.tmp"
+        qr.make_image(fill_color="black", back_color="white").save(staging_path, format='PNG')
+        os.replace(staging_path, qr_path)
+
+    return send_file(qr_path, mimetype='image/png', max_age=86400, conditional=True)
 
 
 @app.route('/results/<session_id>')
 def results(session_id):
-    if session_id not in session_states:
+    state = session_store.get(session_id)
+    if not state:
         return redirect(url_for('index'))
-    
-    state = session_states[session_id]
-    qr_code_data = None
+
     download_url = None
+    qr_image_url = None
+    if state.get('apk_path'):
+        download_url = host_address.base_url() + url_for('download_apk', session_id=session_id)
+        qr_image_url = url_for('session_qr', session_id=session_id)
 
-    # Generate download URL and QR code if APK exists
-    if state.get('apk_path') and os.path.exists(state['apk_path']):
-        try:
-            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            s.connect(("8.8.8.8", 80))
-            ip_address = s.getsockname()[0]
-            s.close()
-            download_url = f"http://{ip_address}:5000/download/{session_id}"
-            
-            # GENERATE QR CODE
-            qr = qrcode.QRCode(version=1, box_size=10, border=5)
-            qr.add_data(download_url)
-            qr.make(fit=True)
-            
-            qr_img = qr.make_image(fill_color="black", back_color="white")
-            
-            # Convert to base64
-            img_buffer = io.BytesIO()
-            qr_img.save(img_buffer, format='PNG')
-            img_buffer.seek(0)
-            qr_code_data = base64.b64encode(img_buffer.getvalue()).decode()
-            
-        except Exception as e:
-            print(f"QR code generation error: {e}")
-            download_url = f"http://localhost:5000/download/{session_id}"
-
-    print(f"🔍 DEBUG - APK Path: {state.get('apk_path')}")
-    print(f"🔍 DEBUG - APK Exists: {os.path.exists(state.get('apk_path', ''))}")
-    print(f"🔍 DEBUG - Build Status: {state.get('build_status')}")
-    print(f"🔍 DEBUG - QR Code Data: {qr_code_data is not None}")
-    print(f"🔍 DEBUG - Download URL: {download_url}")
-
-    return render_template('results.html',
-                         session_id=session_id,
-                         state=state,
-                         qr_code_data=qr_code_data,
-                         download_url=download_url)
+    response = app.make_response(render_template('results.html',
+                                                 session_id=session_id,
+                                                 state=state,
+                                                 qr_image_url=qr_image_url,
+                                                 download_url=download_url))
+    # Ask Chromium to send the CPU architecture with the download request (honoured on HTTPS and localhost)
+    response.headers['Accept-CH'] = ', '.join(ABI_CLIENT_HINTS)
+    return response
+
+
+def start_background_services():
+    """Start the per-process services; WSGI hosts that import `app` call this once per worker."""
+    # Started first so PUB_HOSTED_URL and the Gradle mirror URL are set before any pub get or build plan
+    dependency_mirror.start()
+    workspace_pool.warm_up()
+    # Resolved once up front, so rendering results never has to look at the network
+    host_address.base_url()
 
 
 if __name__ == '__main__':
     os.makedirs('output', exist_ok=True)
     cleanup_old_builds()
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # The debug reloader runs this block in a watcher process too; only warm up in the serving one
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_services()
+    app.run(debug=True, host='0.0.0.0', port=HostConfig.SERVER_PORT)
@@ -0,0 +1,58 @@
+"""Benchmark the single-pass feature extractor against per-keyword substring scans.
+
+Run from the repository root:  python benchmarks/feature_extraction.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.feature_extractor import (KEYWORDS, DEVICE_KEYWORDS, CONTEXT_DEVICE_KEYWORDS,
+                                        extract_features, match_tags)
+
+BASE_PROMPT = ("Build an ESP32 app that reads temperature and humidity from a DHT11 sensor, "
+               "controls a relay and a neopixel strip with on off buttons, and has a brightness "
+               "control slider plus a joystick for the servo angle control. ")
+
+
+def substring_scan(text: str) -> set:
+    """What the agents did before, at its cheapest: one lower() and one `in` scan per keyword."""
+    text = text.lower()
+    found = set()
+    for table in (KEYWORDS, DEVICE_KEYWORDS, CONTEXT_DEVICE_KEYWORDS):
+        for group, phrases in table.items():
+            if any(phrase in text for phrase in phrases):
+                found.add(group)
+    return found
+
+
+def bench(label: str, fn, number: int) -> float:
+    seconds = min(timeit.repeat(fn, number=number, repeat=5)) / number
+    print(f"  {label:<32}{seconds * 1e6:>12.1f} us")
+    return seconds
+
+
+def uncached_features(prompt: str):
+    extract_features.cache_clear()
+    extract_features(prompt)
+
+
+def main():
+    for repeat in (1, 10, 100, 1000):
+        prompt = BASE_PROMPT * repeat
+        number = max(1, 2000 // repeat)
+        print(f"prompt length {len(prompt):,} chars")
+        # Matcher against matcher: both return the keyword groups the prompt mentions
+        single = bench('single pass (match_tags)', lambda: match_tags(prompt), number)
+        scans = bench('substring scans', lambda: substring_scan(prompt), number)
+        print(f"  matcher speedup {scans / single:.1f}x")
+        # The analyzer and the code generator share one FeatureSet per prompt
+        bench('extract_features, uncached', lambda: uncached_features(prompt), number)
+        extract_features(prompt)
+        bench('extract_features, cached', lambda: extract_features(prompt), number)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -11,6 +11,13 @@ class AgentConfig:
     ARCHITECTURE_DESIGNER_SERVICE = os.getenv("ARCHITECTURE_DESIGNER_SERVICE", "groq")  # "groq" or "anthropic"
     CODE_GENERATOR_SERVICE = os.getenv("CODE_GENERATOR_SERVICE", "anthropic")  # "groq" or "anthropic"
     
+    # Answer clear-cut prompts with the local keyword analysis and only send ambiguous ones to the LLM
+    ANALYZER_LOCAL_MODE = os.getenv("ANALYZER_LOCAL_MODE", "true").lower() == "true"
+    ANALYZER_CONFIDENCE_THRESHOLD = float(os.getenv("ANALYZER_CONFIDENCE_THRESHOLD", "0.75"))
+    
+    # Serve architectures from the precomputed library instead of asking the LLM
+    ARCHITECTURE_LIBRARY_ENABLED = os.getenv("ARCHITECTURE_LIBRARY_ENABLED", "true").lower() == "true"
+    
     # API Keys validation
     GROQ_API_KEY = os.getenv("GROQ_API_KEY")
     ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
@@ -44,4 +51,142 @@ class AgentConfig:
             "prompt_analyzer": cls.PROMPT_ANALYZER_SERVICE,
             "architecture_designer": cls.ARCHITECTURE_DESIGNER_SERVICE,
             "code_generator": cls.CODE_GENERATOR_SERVICE
-        }
\ No newline at end of file
+        }
+
+
+class BuildConfig:
+    """Configuration for Flutter project creation and APK builds."""
+
+    # Flutter SDK location; falls back to whatever `flutter` is on PATH
+    FLUTTER_SDK_PATH = os.getenv("FLUTTER_SDK_PATH", "/usr/local/flutter")
+
+    # Golden skeleton cache used instead of running `flutter create` per session
+    SKELETON_CACHE_ENABLED = os.getenv("SKELETON_CACHE_ENABLED", "true").lower() == "true"
+    SKELETON_CACHE_DIR = os.getenv("SKELETON_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "skeletons"))
+    PROJECT_PLATFORMS = os.getenv("PROJECT_PLATFORMS", "android")
+    ANDROID_LANGUAGE = os.getenv("ANDROID_LANGUAGE", "kotlin")
+
+    # Pre-warmed build workspaces that already hold pub and Gradle outputs
+    WORKSPACE_POOL_SIZE = int(os.getenv("WORKSPACE_POOL_SIZE", "2"))
+    WORKSPACE_POOL_DIR = os.getenv("WORKSPACE_POOL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "workspaces"))
+    WORKSPACE_CHECKOUT_TIMEOUT = int(os.getenv("WORKSPACE_CHECKOUT_TIMEOUT", "5"))
+
+    # Content-addressed cache of built APKs
+    APK_CACHE_ENABLED = os.getenv("APK_CACHE_ENABLED", "true").lower() == "true"
+    APK_CACHE_DIR = os.getenv("APK_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "apks"))
+
+    # "universal" (one fat APK), "split-per-abi" (one APK per ABI) or "target-platform" (only the listed platforms)
+    APK_BUILD_MODE = os.getenv("APK_BUILD_MODE", "universal").strip().lower()
+    APK_TARGET_PLATFORMS = [platform.strip() for platform in os.getenv("APK_TARGET_PLATFORMS", "android-arm64").split(",") if platform.strip()]
+    # Served when the device's ABI is unknown and no universal APK was built
+    APK_DEFAULT_ABI = os.getenv("APK_DEFAULT_ABI", "arm64-v8a")
+
+    # Built APKs: deduplicated by SHA-256, least recently downloaded evicted beyond the budget (0 = unlimited)
+    ARTIFACT_STORE_DIR = os.getenv("ARTIFACT_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "output"))
+    ARTIFACT_STORE_BUDGET_MB = int(os.getenv("ARTIFACT_STORE_BUDGET_MB", "10240"))
+
+    # Scaffold and resolve dependencies under a provisional name while the LLM stages run
+    SPECULATIVE_SCAFFOLD_ENABLED = os.getenv("SPECULATIVE_SCAFFOLD_ENABLED", "true").lower() == "true"
+
+    # Output kept per session from flutter/Gradle processes (lines, and characters per line)
+    PROCESS_LOG_LINES = int(os.getenv("PROCESS_LOG_LINES", "500"))
+    PROCESS_LOG_LINE_CHARS = int(os.getenv("PROCESS_LOG_LINE_CHARS", "2000"))
+    # Build with -v so Gradle task lines stream and drive the progress percentage
+    BUILD_VERBOSE_PROGRESS = os.getenv("BUILD_VERBOSE_PROGRESS", "true").lower() == "true"
+    BUILD_TIMEOUT = int(os.getenv("BUILD_TIMEOUT", "600"))
+
+    # Parallel Gradle builds: each reserves this many cores and MB of memory; 0 parallel means "as many as fit"
+    BUILD_CPUS = int(os.getenv("BUILD_CPUS", "4"))
+    BUILD_MEMORY_MB = int(os.getenv("BUILD_MEMORY_MB", "3072"))
+    BUILD_MEMORY_HEADROOM_MB = int(os.getenv("BUILD_MEMORY_HEADROOM_MB", "1024"))
+    BUILD_MAX_PARALLEL = int(os.getenv("BUILD_MAX_PARALLEL", "0"))
+    # JVM heap caps inside that reservation: the Gradle daemon (org.gradle.jvmargs) and client (GRADLE_OPTS)
+    BUILD_JVM_HEAP_MB = int(os.getenv("BUILD_JVM_HEAP_MB", "2048"))
+    BUILD_CLIENT_HEAP_MB = int(os.getenv("BUILD_CLIENT_HEAP_MB", "256"))
+
+
+class JobConfig:
+    """Configuration for the background generation job scheduler."""
+
+    # Worker threads running whole generation jobs
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "8"))
+    # Jobs accepted (running + waiting) before new submissions get HTTP 429
+    JOB_QUEUE_LIMIT = int(os.getenv("JOB_QUEUE_LIMIT", "32"))
+    # Concurrent stages per resource class
+    LLM_STAGE_CONCURRENCY = int(os.getenv("LLM_STAGE_CONCURRENCY", "8"))
+    BUILD_STAGE_CONCURRENCY = int(os.getenv("BUILD_STAGE_CONCURRENCY", "2"))
+    # Retry-After hint used until real job durations have been observed
+    JOB_RETRY_AFTER = int(os.getenv("JOB_RETRY_AFTER", "30"))
+
+
+class SessionConfig:
+    """Configuration for where generation sessions are kept."""
+
+    # "sqlite" survives restarts and is shared between worker processes; "memory" is per process
+    SESSION_STORE_BACKEND = os.getenv("SESSION_STORE_BACKEND", "sqlite")
+    SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "sessions.db"))
+    # Sessions older than this are evicted
+    SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(24 * 3600)))
+
+
+class CacheConfig:
+    """Configuration for the on-disk LLM response cache."""
+
+    LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "llm_responses.db"))
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+    LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+
+class MirrorConfig:
+    """Configuration for the local pub and Maven dependency mirror."""
+
+    # Serve pub packages and Maven artifacts from a localhost pull-through mirror
+    DEPENDENCY_MIRROR_ENABLED = os.getenv("DEPENDENCY_MIRROR_ENABLED", "true").lower() == "true"
+    MIRROR_DIR = os.getenv("MIRROR_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "mirror"))
+    MIRROR_HOST = os.getenv("MIRROR_HOST", "127.0.0.1")
+    # A fixed port keeps the hosted URL recorded in pubspec.lock stable across restarts
+    MIRROR_PORT = int(os.getenv("MIRROR_PORT", "5780"))
+    # Air-gapped hosts: never contact upstream, serve only what has been mirrored
+    MIRROR_OFFLINE = os.getenv("MIRROR_OFFLINE", "false").lower() == "true"
+    # Fetch the manifest packages in the background on startup
+    MIRROR_SEED_ON_START = os.getenv("MIRROR_SEED_ON_START", "true").lower() == "true"
+    PUB_UPSTREAM_URL = os.getenv("PUB_UPSTREAM_URL", "https://pub.dev")
+    MAVEN_UPSTREAM_URLS = [url.strip() for url in os.getenv("MAVEN_UPSTREAM_URLS", ",".join([
+        "https://dl.google.com/dl/android/maven2",
+        "https://repo.maven.apache.org/maven2",
+        "https://plugins.gradle.org/m2",
+        "https://storage.googleapis.com/download.flutter.io",
+    ])).split(",") if url.strip()]
+    MIRROR_FETCH_TIMEOUT = int(os.getenv("MIRROR_FETCH_TIMEOUT", "60"))
+    # Re-fetch cached pub.dev package listings older than this (seconds) so new releases show up; 0 keeps them forever
+    MIRROR_LISTING_TTL = int(os.getenv("MIRROR_LISTING_TTL", "3600"))
+
+
+class MetricsConfig:
+    """Configuration for in-process timing spans and the /api/metrics endpoint."""
+
+    # Most recent durations kept per span for percentile estimates
+    METRICS_SAMPLE_WINDOW = int(os.getenv("METRICS_SAMPLE_WINDOW", "2048"))
+    # Sessions whose individual spans are kept for /api/metrics/<session_id>
+    METRICS_SESSION_LIMIT = int(os.getenv("METRICS_SESSION_LIMIT", "500"))
+
+
+class DownloadConfig:
+    """Configuration for serving built APKs to phones."""
+
+    # "" serves the bytes from Python; "x-accel-redirect" (nginx) or "x-sendfile" (Apache, lighttpd)
+    # hand the transfer to a front proxy once the request has been authorised here
+    DOWNLOAD_OFFLOAD = os.getenv("DOWNLOAD_OFFLOAD", "").strip().lower()
+    # Internal proxy location that maps to ARTIFACT_STORE_DIR, used with x-accel-redirect
+    DOWNLOAD_ACCEL_PREFIX = os.getenv("DOWNLOAD_ACCEL_PREFIX", "/protected-artifacts/")
+
+
+class HostConfig:
+    """Configuration for the address phones use to reach this server."""
+
+    # Full base URL to advertise, e.g. https://apks.example.lan; skips detection entirely
+    PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "").strip()
+    # Interface name, address or network (CIDR) to advertise when a host has several
+    ADVERTISE_INTERFACE = os.getenv("ADVERTISE_INTERFACE", "").strip()
+    SERVER_PORT = int(os.getenv("SERVER_PORT", "5000"))
@@ -0,0 +1,200 @@
+"""Drive N concurrent generation sessions through the HTTP API and report throughput and latency.
+
+Run from the repository root:
+
+    python loadtest/driver.py --sessions 20 --concurrency 5
+
+Without --base-url the app is started in-process with the stub LLM clients and the fake
+`flutter` from loadtest/bin, in a scratch directory, so no API keys, SDK or network are needed.
+Pass --base-url http://host:5000 to load a real deployment instead.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+LOADTEST_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(LOADTEST_DIR)
+sys.path.insert(0, REPO_ROOT)
+
+PROMPTS = [
+    "Temperature and humidity monitor for a DHT11 sensor",
+    "Neopixel on and off buttons with brightness control slider",
+    "Relay switch controller with two relays",
+    "Servo angle control with a joystick",
+    "Soil moisture dashboard with buzzer alarm",
+    "RGB color control for an LED strip",
+]
+FINISHED = ('completed', 'failed')
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+_opener = urllib.request.build_opener(_NoRedirect)
+
+
+def percentile(samples: list, q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))]
+
+
+class LoadDriver:
+    def __init__(self, base_url: str, poll_interval: float, session_timeout: float):
+        self.base_url = base_url.rstrip('/')
+        self.poll_interval = poll_interval
+        self.session_timeout = session_timeout
+        self.latencies = {}
+        self.outcomes = {}
+        self._lock = threading.Lock()
+
+    def _request(self, name: str, path: str, method: str = 'GET', data: dict = None):
+        """Send one request and record its latency under name; returns (status, headers, body)."""
+        body = urllib.parse.urlencode(data).encode('utf-8') if data is not None else None
+        request = urllib.request.Request(self.base_url + path, data=body, method=method)
+        start = time.perf_counter()
+        try:
+            response = _opener.open(request, timeout=60)
+            status, headers, payload = response.status, response.headers, response.read()
+        except urllib.error.HTTPError as e:
+            status, headers, payload = e.code, e.headers, e.read()
+        self._sample(name, time.perf_counter() - start)
+        return status, headers, payload
+
+    def _sample(self, name: str, seconds: float):
+        with self._lock:
+            self.latencies.setdefault(name, []).append(seconds)
+
+    def run_session(self, index: int, unique: bool) -> str:
+        started = time.perf_counter()
+        prompt = PROMPTS[index % len(PROMPTS)]
+        if unique:
+            # A distinct prompt per session defeats the LLM and APK caches
+            prompt = f"{prompt} (load test session {index})"
+
+        status, headers, _ = self._request('POST /generate', '/generate', 'POST', {'prompt': prompt, 'hardware_commands': ''})
+        location = headers.get('Location', '') if status in (301, 302, 303) else ''
+        if '/progress/' not in location:
+            return self._finish('generate_error', started)
+        session_id = location.rstrip('/').rsplit('/', 1)[-1]
+
+        while True:
+            status, headers, payload = self._request('POST /api/start-generation', f'/api/start-generation/{session_id}', 'POST', {})
+            if status != 429:
+                break
+            with self._lock:
+                self.outcomes['start_retries'] = self.outcomes.get('start_retries', 0) + 1
+            time.sleep(float(headers.get('Retry-After', '1')))
+        if status != 202:
+            return self._finish('start_error', started)
+
+        deadline = started + self.session_timeout
+        while time.perf_counter() < deadline:
+            status, _, payload = self._request('GET /api/progress', f'/api/progress/{session_id}')
+            if status == 200 and json.loads(payload).get('build_status') in FINISHED:
+                return self._finish(json.loads(payload)['build_status'], started)
+            time.sleep(self.poll_interval)
+        return self._finish('timeout', started)
+
+    def _finish(self, outcome: str, started: float) -> str:
+        with self._lock:
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        self._sample(f'session ({outcome})', time.perf_counter() - started)
+        return outcome
+
+    def server_metrics(self):
+        try:
+            status, _, payload = self._request('GET /api/metrics', '/api/metrics')
+            return json.loads(payload) if status == 200 else None
+        except Exception:
+            return None
+
+
+def start_local_server(workdir: str) -> str:
+    """Start the app in this process against stubs and the fake flutter; returns its base URL."""
+    defaults = {
+        'FLUTTER_SDK_PATH': LOADTEST_DIR,
+        'DEPENDENCY_MIRROR_ENABLED': 'false',
+        'SESSION_STORE_BACKEND': 'memory',
+        'WORKSPACE_POOL_SIZE': '0',
+        'APK_CACHE_ENABLED': 'false',
+        'LLM_CACHE_ENABLED': 'false',
+        'SKELETON_CACHE_DIR': os.path.join(workdir, 'skeletons'),
+        'APK_CACHE_DIR': os.path.join(workdir, 'apks'),
+        'ARTIFACT_STORE_DIR': os.path.join(workdir, 'output'),
+        'LLM_CACHE_PATH': os.path.join(workdir, 'llm_responses.db'),
+    }
+    for key, value in defaults.items():
+        os.environ.setdefault(key, value)
+    # Bare `flutter` invocations resolve through PATH
+    os.environ['PATH'] = os.path.join(LOADTEST_DIR, 'bin') + os.pathsep + os.environ.get('PATH', '')
+    os.chdir(workdir)
+
+    from loadtest import stub_llm
+    stub_llm.install()
+    import app as flask_app
+    from werkzeug.serving import make_server
+
+    # Per-request access logs would drown the pipeline output
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, flask_app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='loadtest-server', daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}'
+
+
+def report(driver: LoadDriver, wall: float, sessions: int):
+    completed = driver.outcomes.get('completed', 0)
+    print(f"\n=== {sessions} sessions in {wall:.1f}s ===")
+    for outcome, count in sorted(driver.outcomes.items()):
+        print(f"  {outcome:<16}{count:>6}")
+    print(f"  throughput      {completed / wall if wall else 0:>6.2f} completed sessions/s "
+          f"({completed / wall * 60 if wall else 0:.1f}/min)")
+
+    print(f"\n  {'latency (s)':<34}{'n':>6}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for name, samples in sorted(driver.latencies.items()):
+        print(f"  {name:<34}{len(samples):>6}" + ''.join(
+            f"{value:>9.3f}" for value in (percentile(samples, 0.5), percentile(samples, 0.95),
+                                           percentile(samples, 0.99), max(samples))))
+
+    server = driver.server_metrics()
+    if server and server.get('spans'):
+        print(f"\n  {'server spans (s)':<34}{'n':>6}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+        for key, span in sorted(server['spans'].items()):
+            print(f"  {key[:34]:<34}{span['count']:>6}{span['p50']:>9.3f}{span['p95']:>9.3f}"
+                  f"{span['p99']:>9.3f}{span['max']:>9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=10, help='total sessions to run')
+    parser.add_argument('--concurrency', type=int, default=5, help='sessions in flight at once')
+    parser.add_argument('--base-url', help='load an already running server instead of an in-process one')
+    parser.add_argument('--poll-interval', type=float, default=0.5, help='seconds between progress polls')
+    parser.add_argument('--session-timeout', type=float, default=900, help='give up on a session after this long')
+    parser.add_argument('--repeat-prompts', action='store_true', help='reuse prompts so caches can hit')
+    args = parser.parse_args()
+
+    base_url = args.base_url or start_local_server(tempfile.mkdtemp(prefix='flutter-loadtest-'))
+    print(f"🚀 {args.sessions} sessions, {args.concurrency} concurrent, against {base_url}")
+
+    driver = LoadDriver(base_url, args.poll_interval, args.session_timeout)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(lambda index: driver.run_session(index, not args.repeat_prompts), range(args.sessions)))
+    report(driver, time.perf_counter() - started, args.sessions)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Stub Groq and Anthropic clients that answer from canned responses after a configurable delay.
+
+Only the network client inside each real client is replaced, so response caching, metrics spans
+and the agents' parsing all run as in production. STUB_LLM_SECONDS sets the latency (default 0.5)
+and STUB_LLM_JITTER the random extra fraction on top of it.
+"""
+import os
+import json
+import time
+import random
+import sys
+from types import SimpleNamespace
+
+import services.groq_client
+import services.anthropic_client
+
+RealGroqClient = services.groq_client.GroqClient
+RealAnthropicClient = services.anthropic_client.AnthropicClient
+
+STUB_ARCHITECTURE = {
+    "project_structure": {"lib": {"main.dart": "App entry point"}},
+    "dependencies": {"flutter_blue_plus": "^1.36.8", "permission_handler": "^11.3.1"},
+    "main_features": [{"name": "Bluetooth Scanning", "description": "Discover nearby BLE devices."}],
+    "file_templates": {"lib/main.dart": {"purpose": "Main UI and app logic."}},
+}
+
+STUB_DART = """import 'package:flutter/material.dart';
+
+void main() => runApp(const MaterialApp(home: Scaffold(body: Center(child: Text('stub')))));
+"""
+
+
+def _pause():
+    seconds = float(os.getenv('STUB_LLM_SECONDS', '0.5'))
+    jitter = float(os.getenv('STUB_LLM_JITTER', '0.3'))
+    time.sleep(seconds * (1 + random.uniform(0, jitter)))
+
+
+def canned_response(system_prompt: str, user_prompt: str) -> str:
+    """Answer in the shape the calling agent expects, judged by its system prompt."""
+    system = system_prompt.lower()
+    if 'architecture' in system:
+        return json.dumps(STUB_ARCHITECTURE)
+    if 'json' in system:
+        words = [word for word in user_prompt.split() if word.isalpha()][:3] or ['Stub']
+        return json.dumps({
+            "app_name": ' '.join(word.title() for word in words),
+            "description": user_prompt[:120],
+            "features": ["bluetooth_scanning", "device_connection", "data_transmission"],
+            "ui_components": ["button"],
+            "control_types": ["buttons"],
+            "color_theme": "blue",
+            "complexity": "simple",
+        })
+    return STUB_DART
+
+
+class _StubChatModel:
+    def invoke(self, messages):
+        _pause()
+        return SimpleNamespace(content=canned_response(messages[0].content, messages[-1].content))
+
+
+class _StubMessages:
+    def create(self, model, max_tokens, temperature, system, messages):
+        _pause()
+        return SimpleNamespace(content=[SimpleNamespace(text=canned_response(system, messages[-1]['content']))])
+
+
+class StubGroqClient(RealGroqClient):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.client = _StubChatModel()
+
+
+class StubAnthropicClient(RealAnthropicClient):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.client = SimpleNamespace(messages=_StubMessages())
+
+
+def install():
+    """Swap the stubs in; call before the agents (or app) are imported."""
+    os.environ.setdefault('GROQ_API_KEY', 'stub')
+    os.environ.setdefault('ANTHROPIC_API_KEY', 'stub')
+    services.groq_client.GroqClient = StubGroqClient
+    services.anthropic_client.AnthropicClient = StubAnthropicClient
+    # Agents that were already imported hold their own references
+    for module_name in ('agents.prompt_analyzer', 'agents.architecture_designer', 'agents.code_generator'):
+        module = sys.modules.get(module_name)
+        if module is not None:
+            if hasattr(module, 'GroqClient'):
+                module.GroqClient = StubGroqClient
+            if hasattr(module, 'AnthropicClient'):
+                module.AnthropicClient = StubAnthropicClient
@@ -17,4 +17,8 @@ class AppGenerationState(TypedDict):
     error_log: List[str]
     session_id: str
     project_path: Optional[str]  # NEW: Path to the created Flutter project
-    temp_dir: Optional[str] 
+    temp_dir: Optional[str]
+    artifact_plan_key: Optional[str]  # Key of the pipeline inputs in the APK cache
+    stage_fingerprints: Dict[str, str]  # Input hash per stage, used to skip unchanged stages on regenerate
+    config_plan: Optional[Dict[str, Any]]  # Planned pubspec/manifest/Gradle end state, see services/config_planner.py
+    code_provenance: Optional[str]  # 'template' when main.dart came from the trusted Dart templates
@@ -1,7 +1,9 @@
 import os
-import re
 from anthropic import Anthropic
 from dotenv import load_dotenv
+from services.llm_cache import llm_cache
+from services.metrics import metrics
+from services.dart_fixes import smart_api_fixes
 
 load_dotenv()
 
@@ -11,19 +13,30 @@ class AnthropicClient:
             api_key=os.getenv("ANTHROPIC_API_KEY")
         )
         self.model = model_name
+        self.temperature = 0.1
+
+    def _create_message(self, system_prompt: str, user_prompt: str, max_tokens: int = 4000) -> str:
+        '''Send one message, answering repeated identical requests from the response cache.'''
+
+        def _call():
+            with metrics.span(f'anthropic {self.model}', 'llm'):
+                response = self.client.messages.create(
+                    model=self.model,
+                    max_tokens=max_tokens,
+                    temperature=self.temperature,
+                    system=system_prompt,
+                    messages=[
+                        {"role": "user", "content": user_prompt}
+                    ]
+                )
+            return response.content[0].text
+
+        cache_key = llm_cache.make_key('anthropic', self.model, self.temperature, max_tokens, system_prompt, user_prompt)
+        return llm_cache.cached_call(cache_key, _call)
 
     def chat_completion(self, system_prompt: str, user_prompt: str) -> str:
         try:
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=4000,
-                temperature=0.1,
-                system=system_prompt,
-                messages=[
-                    {"role": "user", "content": user_prompt}
-                ]
-            )
-            return response.content[0].text
+            return self._create_message(system_prompt, user_prompt)
         except Exception as e:
             print(f"Anthropic API error: {e}")
             raise Exception(f"Failed to get response from Anthropic: {str(e)}")
@@ -90,17 +103,7 @@ import 'dart:io';
 '''
 
         try:
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=4000,
-                temperature=0.1,
-                system=system_prompt,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
-
-            generated_code = response.content[0].text
+            generated_code = self._create_message(system_prompt, prompt)
 
             # Apply smart fixes to ensure compatibility
             fixed_code = self._smart_api_fixes(generated_code)
@@ -114,39 +117,8 @@ import 'dart:io';
     def _smart_api_fixes(self, code: str) -> str:
         '''Apply targeted fixes while preserving AI creativity.'''
 
-        # Fix 1: Replace _devices with scanResults
-        code = re.sub(r'_devices\s*=.*?results.*?\.toList\(\);', 
-                     'setState(() { scanResults = results; });', code)
-        code = code.replace('_devices', 'scanResults')
-
-        # Fix 2: Fix deprecated button parameters
-        code = re.sub(r'primary:\s*(Colors\.\w+)', r'backgroundColor: \1', code)
-        code = re.sub(r'onPrimary:\s*(Colors\.\w+)', r'foregroundColor: \1', code)
-
-        # Fix 3: Fix Uint8List usage
-        code = code.replace('Uint8List.fromList([int.parse(command)])', 'command.codeUnits')
-        code = code.replace('Uint8List.fromList(command.codeUnits)', 'command.codeUnits')
-
-        # Fix 4: Replace _flutterBlue references
-        code = code.replace('_flutterBlue.', 'FlutterBluePlus.')
-
-        # Fix 5: Fix theme API
-        code = code.replace('CardTheme(', 'CardThemeData(')
-        code = code.replace('ElevatedButtonTheme(', 'ElevatedButtonThemeData(')
-
-        # Fix 6: Add missing imports if needed
-        required_imports = [
-            "import 'package:flutter/material.dart';",
-            "import 'package:flutter_blue_plus/flutter_blue_plus.dart';",
-            "import 'package:permission_handler/permission_handler.dart';",
-            "import 'dart:io';"
-        ]
-
-        for import_stmt in required_imports:
-            if import_stmt not in code:
-                code = import_stmt + "\n" + code
-
-        return code
+        fixed_code, _ = smart_api_fixes.apply(code)
+        return fixed_code
 
     def analyze_prompt(self, user_prompt: str) -> str:
         '''Analyze user prompt dynamically.'''
@@ -177,16 +149,7 @@ Return ONLY JSON:
 '''
 
         try:
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=1000,
-                temperature=0.1,
-                system=system_prompt,
-                messages=[
-                    {"role": "user", "content": user_prompt}
-                ]
-            )
-            return response.content[0].text
+            return self._create_message(system_prompt, user_prompt, max_tokens=1000)
         except Exception as e:
             print(f"Prompt analysis error: {e}")
             return '{"app_name": "Bluetooth Controller", "description": "Professional Bluetooth application", "features": ["bluetooth_scanning", "device_connection", "data_transmission"], "ui_components": ["status_card", "control_buttons", "device_list"], "control_types": ["buttons"], "color_theme": "gradient_blue_purple", "complexity": "professional"}'
\ No newline at end of file
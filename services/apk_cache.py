@@ -0,0 +1,139 @@
+import os
+import json
+import time
+import hashlib
+from config import BuildConfig
+from services.flutter_tools import flutter_version
+from services.artifact_store import artifact_store
+from services.apk_variants import build_mode
+
+# Every file whose bytes decide what ends up in the APK
+CACHE_INPUTS = [
+    'lib/main.dart',
+    'pubspec.yaml',
+    'android/app/src/main/AndroidManifest.xml',
+    'android/app/build.gradle',
+    'android/app/build.gradle.kts',
+    'android/build.gradle',
+    'android/build.gradle.kts',
+]
+
+GRADLE_WRAPPER_PROPERTIES = 'android/gradle/wrapper/gradle-wrapper.properties'
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Sources that shape the generated project: (directory, extension) for whole directories, plus single files
+GENERATOR_SOURCE_DIRS = [('agents', '.py'), ('dart_templates', '.tmpl')]
+GENERATOR_SOURCE_FILES = [
+    'services/template_engine.py',
+    'services/feature_extractor.py',
+    'services/dart_fixes.py',
+    'services/config_planner.py',
+    'services/architecture_library.py',
+]
+
+
+class ApkCache:
+    """Maps a hash of the build inputs plus toolchain to a previously built APK."""
+
+    def __init__(self, cache_dir: str = None):
+        self.cache_dir = cache_dir or BuildConfig.APK_CACHE_DIR
+        self.enabled = BuildConfig.APK_CACHE_ENABLED
+        self._generator_fingerprint = None
+
+    def content_key(self, project_path: str) -> str:
+        """Key derived from the final project files, computed right before building."""
+        digest = hashlib.sha256()
+        digest.update(flutter_version().encode('utf-8'))
+        # The same sources give different APKs per build mode
+        digest.update(build_mode().encode('utf-8'))
+        for rel_path in CACHE_INPUTS + [GRADLE_WRAPPER_PROPERTIES]:
+            full_path = os.path.join(project_path, rel_path)
+            digest.update(rel_path.encode('utf-8'))
+            if os.path.isfile(full_path):
+                with open(full_path, 'rb') as f:
+                    digest.update(hashlib.sha256(f.read()).digest())
+            else:
+                digest.update(b'<missing>')
+        return digest.hexdigest()
+
+    def plan_key(self, state: dict) -> str:
+        """Key derived from the pipeline inputs, available before any project exists."""
+        payload = json.dumps({
+            'user_prompt': state.get('user_prompt', '').strip().lower(),
+            'hardware_commands': state.get('hardware_commands', '').strip(),
+            'requirements': state.get('structured_requirements', {}),
+            'dependencies': state.get('flutter_structure', {}).get('dependencies', {}),
+            'generator': self._generator_sources_fingerprint(),
+            'flutter': flutter_version(),
+            'build_mode': build_mode(),
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def lookup(self, content_key: str):
+        if not self.enabled:
+            return None
+        return self._load_entry(content_key)
+
+    def lookup_plan(self, plan_key: str):
+        if not self.enabled or not plan_key:
+            return None
+        plan_file = os.path.join(self.cache_dir, 'plans', plan_key)
+        try:
+            with open(plan_file, 'r', encoding='utf-8') as f:
+                content_key = f.read().strip()
+        except OSError:
+            return None
+        return self._load_entry(content_key)
+
+    def store(self, content_key: str, variants: dict, generated_files: dict, plan_key: str = None):
+        """Remember which artifact-store blobs ({variant: sha256}) the content key built; the APK bytes live only there."""
+        if not self.enabled:
+            return
+        try:
+            entry_dir = os.path.join(self.cache_dir, content_key)
+            os.makedirs(entry_dir, exist_ok=True)
+            meta_path = os.path.join(entry_dir, 'meta.json')
+            with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump({'created_at': time.time(), 'variants': variants, 'generated_files': generated_files}, f)
+            os.replace(meta_path + '.tmp', meta_path)
+
+            if plan_key:
+                plans_dir = os.path.join(self.cache_dir, 'plans')
+                os.makedirs(plans_dir, exist_ok=True)
+                with open(os.path.join(plans_dir, plan_key), 'w', encoding='utf-8') as f:
+                    f.write(content_key)
+            print(f"📦 Cached APK under {content_key[:12]}")
+        except Exception as e:
+            print(f"⚠️ Could not store APK in cache: {e}")
+
+    def _load_entry(self, content_key: str):
+        entry_dir = os.path.join(self.cache_dir, content_key)
+        try:
+            with open(os.path.join(entry_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        variants = meta.get('variants') or {}
+        if variants and all(artifact_store.has_blob(sha256) for sha256 in variants.values()):
+            return {'key': content_key, 'variants': variants, 'generated_files': meta.get('generated_files', {})}
+        # The blob was evicted from the artifact store under its disk budget
+        return None
+
+    def _generator_sources_fingerprint(self) -> str:
+        # Generated code depends on the generator sources, so a plan hit is only valid for the same code
+        if self._generator_fingerprint is None:
+            rel_paths = list(GENERATOR_SOURCE_FILES)
+            for directory, extension in GENERATOR_SOURCE_DIRS:
+                rel_paths.extend(f'{directory}/{name}' for name in os.listdir(os.path.join(REPO_ROOT, directory))
+                                 if name.endswith(extension))
+            digest = hashlib.sha256()
+            for rel_path in sorted(rel_paths):
+                digest.update(rel_path.encode('utf-8'))
+                with open(os.path.join(REPO_ROOT, *rel_path.split('/')), 'rb') as f:
+                    digest.update(hashlib.sha256(f.read()).digest())
+            self._generator_fingerprint = digest.hexdigest()
+        return self._generator_fingerprint
+
+
+apk_cache = ApkCache()
@@ -0,0 +1,85 @@
+import re
+from config import BuildConfig
+
+UNIVERSAL = 'universal'
+
+# flutter --target-platform values and the Android ABI each one produces
+TARGET_PLATFORM_ABIS = {
+    'android-arm': 'armeabi-v7a',
+    'android-arm64': 'arm64-v8a',
+    'android-x64': 'x86_64',
+}
+
+# CPU names seen in Android user agents, most specific first
+USER_AGENT_ABIS = (
+    (re.compile(r'aarch64|arm64|armv8(?!l)', re.IGNORECASE), 'arm64-v8a'),
+    # armv8l is a 32-bit userland on a 64-bit core, which only runs armeabi-v7a code
+    (re.compile(r'armv7|armv8l|armeabi', re.IGNORECASE), 'armeabi-v7a'),
+    (re.compile(r'x86_64|x64|amd64', re.IGNORECASE), 'x86_64'),
+)
+
+
+def flutter_build_args() -> list:
+    """Extra `flutter build apk` arguments for the configured APK_BUILD_MODE."""
+    if BuildConfig.APK_BUILD_MODE == 'split-per-abi':
+        return ['--split-per-abi']
+    if BuildConfig.APK_BUILD_MODE == 'target-platform':
+        return ['--target-platform', ','.join(BuildConfig.APK_TARGET_PLATFORMS)]
+    return []
+
+
+def build_mode() -> str:
+    """The configured mode with its platforms, as part of cache keys."""
+    if BuildConfig.APK_BUILD_MODE == 'target-platform':
+        return f"target-platform:{','.join(sorted(BuildConfig.APK_TARGET_PLATFORMS))}"
+    return BuildConfig.APK_BUILD_MODE
+
+
+def output_variants(file_names: list) -> dict:
+    """Map the APKs flutter wrote into build/app/outputs/flutter-apk to variant names."""
+    variants = {}
+    for name in file_names:
+        split = re.fullmatch(r'app-(.+)-release\.apk', name)
+        if split:
+            variants[split.group(1)] = name
+        elif name == 'app-release.apk':
+            variants[_fat_variant()] = name
+    return variants
+
+
+def requested_abi(headers) -> str:
+    """The requesting device's ABI from client hints or its user agent, or None when it can't be told.
+
+    Only Android clients are matched: a desktop browser downloading for a phone must get
+    the universal (or default ABI) APK, not one for the desktop's own CPU.
+    """
+    user_agent = headers.get('User-Agent', '')
+    platform = headers.get('Sec-CH-UA-Platform', '').strip('"').lower()
+    if platform != 'android' and 'android' not in user_agent.lower():
+        return None
+    arch = headers.get('Sec-CH-UA-Arch', '').strip('"').lower()
+    if arch:
+        bitness = headers.get('Sec-CH-UA-Bitness', '').strip('"')
+        if arch == 'arm':
+            return 'arm64-v8a' if bitness == '64' else 'armeabi-v7a'
+        if arch == 'x86' and bitness == '64':
+            return 'x86_64'
+    for pattern, abi in USER_AGENT_ABIS:
+        if pattern.search(user_agent):
+            return abi
+    return None
+
+
+def choose_variant(variants: dict, abi: str = None) -> str:
+    """Pick the variant to serve: the device's own ABI, else the universal APK, else the default ABI."""
+    for name in (abi, UNIVERSAL, BuildConfig.APK_DEFAULT_ABI):
+        if name and name in variants:
+            return name
+    return next(iter(variants))
+
+
+def _fat_variant() -> str:
+    # A single target platform yields an APK for just that ABI; otherwise it carries several
+    if BuildConfig.APK_BUILD_MODE == 'target-platform' and len(BuildConfig.APK_TARGET_PLATFORMS) == 1:
+        return TARGET_PLATFORM_ABIS.get(BuildConfig.APK_TARGET_PLATFORMS[0], UNIVERSAL)
+    return UNIVERSAL
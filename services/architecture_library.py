@@ -0,0 +1,80 @@
+import copy
+import itertools
+from functools import lru_cache
+
+# Pinned to the versions the build stage enforces, so the planned pubspec is already final
+BLUETOOTH_DEPENDENCIES = {
+    'flutter_blue_plus': '^1.36.8',
+    'permission_handler': '^11.3.1',
+}
+CHART_DEPENDENCIES = {
+    'fl_chart': '^0.68.0',
+}
+
+BASE_FEATURES = [
+    {"name": "Bluetooth Scanning", "description": "Discover nearby BLE devices."},
+    {"name": "Device Connection", "description": "Connect, discover services and pick read/write characteristics."},
+    {"name": "Permission Handling", "description": "Request Bluetooth and location permissions on startup."},
+]
+
+SENSOR_FEATURES = {
+    'temperature': {"name": "Temperature Display", "description": "Live temperature card fed by notifications."},
+    'humidity': {"name": "Humidity Display", "description": "Live humidity card fed by notifications."},
+    'general_sensor': {"name": "Sensor Monitoring", "description": "Periodic sensor reads with GRASP JSON parsing."},
+}
+
+CONTROL_FEATURES = {
+    'buttons': {"name": "Control Buttons", "description": "ON/OFF buttons that send device commands."},
+    'sliders': {"name": "Slider Controls", "description": "Sliders that send value commands on release."},
+}
+
+KNOWN_SENSORS = tuple(SENSOR_FEATURES)
+KNOWN_CONTROLS = tuple(CONTROL_FEATURES)
+
+
+def feature_signature(requirements: dict) -> tuple:
+    """Reduce requirements to the (sensors, controls, devices) tuple the library is indexed by."""
+    sensors = tuple(sorted(set(requirements.get('sensor_types', [])) & set(KNOWN_SENSORS)))
+    controls = tuple(sorted(set(requirements.get('control_types', [])) & set(KNOWN_CONTROLS)))
+    devices = tuple(sorted(set(requirements.get('devices', []))))
+    return sensors, controls, devices
+
+
+@lru_cache(maxsize=512)
+def _build_architecture(signature: tuple) -> dict:
+    sensors, controls, devices = signature
+
+    dependencies = dict(BLUETOOTH_DEPENDENCIES)
+    if sensors:
+        dependencies.update(CHART_DEPENDENCIES)
+
+    main_features = list(BASE_FEATURES)
+    main_features.extend(SENSOR_FEATURES[sensor] for sensor in sensors)
+    main_features.extend(CONTROL_FEATURES[control] for control in controls)
+    main_features.extend({"name": f"{device.title()} Control", "description": f"Commands for the {device}."}
+                         for device in devices)
+
+    # The code generator emits a single self-contained main.dart, so that is the whole plan
+    return {
+        "project_structure": {"lib": {"main.dart": "App entry point with the Bluetooth UI"}},
+        "dependencies": dependencies,
+        "main_features": main_features,
+        "file_templates": {"lib/main.dart": {"purpose": "Main UI and app logic."}},
+    }
+
+
+def lookup_architecture(requirements: dict) -> dict:
+    """Return a private copy of the precomputed architecture for these requirements."""
+    return copy.deepcopy(_build_architecture(feature_signature(requirements)))
+
+
+def _precompute():
+    # Every sensor/control combination without named devices covers the common prompts
+    for sensor_count in range(len(KNOWN_SENSORS) + 1):
+        for sensors in itertools.combinations(sorted(KNOWN_SENSORS), sensor_count):
+            for control_count in range(len(KNOWN_CONTROLS) + 1):
+                for controls in itertools.combinations(sorted(KNOWN_CONTROLS), control_count):
+                    _build_architecture((sensors, controls, ()))
+
+
+_precompute()
@@ -0,0 +1,256 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+from collections import Counter
+from config import BuildConfig
+from services.apk_variants import UNIVERSAL, choose_variant
+
+# ioctl that asks btrfs/XFS to share extents instead of copying bytes (FICLONE)
+FICLONE = 0x40049409
+
+
+class ArtifactStore:
+    """Content-addressed APK storage under output/ with per-session links and a disk budget.
+
+    Layout:
+        blobs/<sha[:2]>/<sha>.apk   one file per distinct APK
+        sessions/<session_id>.json  metadata: blob digest per variant (ABI), download name, last download
+        sessions/<session_id>.png   QR code of the session's download link
+        <download file name>        per-session hardlink to the blob, as before
+
+    When the blobs exceed ARTIFACT_STORE_BUDGET_MB, the sessions downloaded least recently
+    are evicted first and blobs no session refers to any more are deleted.
+    """
+
+    def __init__(self, root: str = None, budget_mb: int = None):
+        self.root = root or BuildConfig.ARTIFACT_STORE_DIR
+        self.budget_bytes = (budget_mb if budget_mb is not None else BuildConfig.ARTIFACT_STORE_BUDGET_MB) * 1024 * 1024
+        self.blobs_dir = os.path.join(self.root, 'blobs')
+        self.sessions_dir = os.path.join(self.root, 'sessions')
+        self._lock = threading.RLock()
+
+    def ingest(self, sources, session_id: str, filename: str, move: bool = True) -> dict:
+        """Take freshly built APKs into the store and link them to the session.
+
+        sources is one APK path or a {variant: path} dict, e.g. one entry per ABI. With
+        move=True the build outputs are renamed (or reflinked across filesystems) rather
+        than copied; the source paths are gone afterwards.
+        """
+        if isinstance(sources, str):
+            sources = {UNIVERSAL: sources}
+        os.makedirs(self.blobs_dir, exist_ok=True)
+        staged = {}
+        try:
+            for variant, source_path in sources.items():
+                fd, staging_path = tempfile.mkstemp(prefix='ingest_', suffix='.apk', dir=self.blobs_dir)
+                os.close(fd)
+                staged[variant] = staging_path
+                self._transfer(source_path, staging_path, move)
+            digests = {variant: self._hash(path) for variant, path in staged.items()}
+            # Held until the session record exists, so a concurrent eviction cannot collect the blobs
+            with self._lock:
+                for variant, sha256 in digests.items():
+                    blob_path = self.blob_path(sha256)
+                    if os.path.isfile(blob_path):
+                        print(f"♻️ Identical {variant} APK already stored ({sha256[:12]}), deduplicated")
+                    else:
+                        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                        os.replace(staged[variant], blob_path)
+                record = self.link(session_id, digests, filename)
+        finally:
+            for staging_path in staged.values():
+                if os.path.exists(staging_path):
+                    os.remove(staging_path)
+        self.enforce_budget(keep=session_id)
+        return record
+
+    def link(self, session_id: str, variants, filename: str) -> dict:
+        """Point the session at already stored blobs ({variant: sha256}, or one digest); returns its record.
+
+        The variant served by default becomes the session's output/ file and its `sha256`.
+        """
+        if isinstance(variants, str):
+            variants = {UNIVERSAL: variants}
+        primary = choose_variant(variants)
+        blob_path = self.blob_path(variants[primary])
+
+        # Checked under the lock eviction takes, so the blobs cannot vanish before they are linked
+        with self._lock:
+            missing = [sha256 for sha256 in variants.values() if not self.has_blob(sha256)]
+            if missing:
+                raise FileNotFoundError(f"Artifact {missing[0][:12]} is not in the store")
+            previous = self.get(session_id)
+            if previous and previous['filename'] != filename:
+                self._remove_file(os.path.join(self.root, previous['filename']))
+
+            session_path = os.path.join(self.root, filename)
+            self._remove_file(session_path)
+            try:
+                os.link(blob_path, session_path)
+            except OSError:
+                # Filesystems without hardlinks get a copy; eviction still reclaims it
+                shutil.copy2(blob_path, session_path)
+
+            now = time.time()
+            record = {
+                'session_id': session_id,
+                'sha256': variants[primary],
+                'variant': primary,
+                'variants': dict(variants),
+                'size': os.path.getsize(blob_path),
+                'filename': filename,
+                'path': session_path,
+                'created_at': now,
+                'last_download': None,
+            }
+            self._write_record(record)
+            if previous:
+                for sha256 in self._digests(previous) - self._digests(record):
+                    self._collect_blob(sha256)
+        return record
+
+    def get(self, session_id: str):
+        try:
+            with open(self._record_path(session_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def touch(self, session_id: str):
+        """Record a download; eviction spares recently downloaded artifacts."""
+        with self._lock:
+            record = self.get(session_id)
+            if record:
+                record['last_download'] = time.time()
+                self._write_record(record)
+
+    def qr_path(self, session_id: str) -> str:
+        return os.path.join(self.sessions_dir, f'{session_id}.png')
+
+    def blob_path(self, sha256: str) -> str:
+        return os.path.join(self.blobs_dir, sha256[:2], f'{sha256}.apk')
+
+    def has_blob(self, sha256: str) -> bool:
+        return bool(sha256) and os.path.isfile(self.blob_path(sha256))
+
+    def usage(self) -> int:
+        """Bytes held by distinct blobs."""
+        total = 0
+        for directory, _, files in os.walk(self.blobs_dir):
+            for name in files:
+                if name.endswith('.apk') and not name.startswith('ingest_'):
+                    total += os.path.getsize(os.path.join(directory, name))
+        return total
+
+    def enforce_budget(self, keep: str = None):
+        """Evict least recently downloaded sessions until the blobs fit the budget."""
+        if self.budget_bytes <= 0:
+            return
+        with self._lock:
+            used = self.usage()
+            if used <= self.budget_bytes:
+                return
+            records = self._records()
+            references = Counter(sha256 for record in records for sha256 in self._digests(record))
+            # Never-downloaded artifacts age from their creation time
+            candidates = sorted((record for record in records if record['session_id'] != keep),
+                                key=lambda record: record.get('last_download') or record.get('created_at') or 0)
+            evicted = 0
+            for record in candidates:
+                if used <= self.budget_bytes:
+                    break
+                self._remove_file(os.path.join(self.root, record['filename']))
+                self._remove_file(self._record_path(record['session_id']))
+                self._remove_file(self.qr_path(record['session_id']))
+                for sha256 in self._digests(record):
+                    references[sha256] -= 1
+                    if references[sha256] == 0:
+                        used -= self._delete_blob(sha256)
+                evicted += 1
+            print(f"🧹 Evicted {evicted} artifact(s); store now uses {used / (1024 * 1024):.1f} MB")
+
+    def _collect_blob(self, sha256: str):
+        """Delete a blob once no session refers to it any more."""
+        if not any(sha256 in self._digests(record) for record in self._records()):
+            self._delete_blob(sha256)
+
+    def _digests(self, record: dict) -> set:
+        return set(record['variants'].values())
+
+    def _delete_blob(self, sha256: str) -> int:
+        """Remove a blob; returns the bytes freed."""
+        blob_path = self.blob_path(sha256)
+        try:
+            size = os.path.getsize(blob_path)
+            os.remove(blob_path)
+            return size
+        except OSError:
+            return 0
+
+    def _records(self) -> list:
+        records = []
+        try:
+            names = os.listdir(self.sessions_dir)
+        except FileNotFoundError:
+            return records
+        for name in names:
+            if name.endswith('.json'):
+                record = self.get(name[:-len('.json')])
+                if record:
+                    records.append(record)
+        return records
+
+    def _write_record(self, record: dict):
+        os.makedirs(self.sessions_dir, exist_ok=True)
+        path = self._record_path(record['session_id'])
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(record, f)
+        os.replace(path + '.tmp', path)
+
+    def _record_path(self, session_id: str) -> str:
+        return os.path.join(self.sessions_dir, f'{session_id}.json')
+
+    def _transfer(self, source_path: str, dest_path: str, move: bool):
+        if move:
+            try:
+                os.replace(source_path, dest_path)
+                return
+            except OSError:
+                # Build directories usually live on another filesystem (tmp); clone or copy instead
+                pass
+        if not self._reflink(source_path, dest_path):
+            shutil.copyfile(source_path, dest_path)
+        if move:
+            os.remove(source_path)
+
+    def _reflink(self, source_path: str, dest_path: str) -> bool:
+        try:
+            import fcntl
+        except ImportError:
+            return False
+        try:
+            with open(source_path, 'rb') as src, open(dest_path, 'wb') as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return True
+        except OSError:
+            return False
+
+    def _hash(self, path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _remove_file(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+artifact_store = ArtifactStore()
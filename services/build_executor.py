@@ -0,0 +1,117 @@
+import os
+import threading
+from contextlib import contextmanager
+from config import BuildConfig
+from services.metrics import metrics
+
+
+def memory_mb():
+    """(total, available) physical memory in MB, or (None, None) when the platform won't say."""
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            info = {line.split(':')[0]: int(line.split()[1]) for line in f if line.strip()}
+        return info['MemTotal'] // 1024, info.get('MemAvailable', info.get('MemFree', 0)) // 1024
+    except (OSError, KeyError, ValueError, IndexError):
+        pass
+    if os.name == 'nt':
+        import ctypes
+
+        class MEMORYSTATUSEX(ctypes.Structure):
+            _fields_ = [('dwLength', ctypes.c_ulong), ('dwMemoryLoad', ctypes.c_ulong),
+                        ('ullTotalPhys', ctypes.c_ulonglong), ('ullAvailPhys', ctypes.c_ulonglong),
+                        ('ullTotalPageFile', ctypes.c_ulonglong), ('ullAvailPageFile', ctypes.c_ulonglong),
+                        ('ullTotalVirtual', ctypes.c_ulonglong), ('ullAvailVirtual', ctypes.c_ulonglong),
+                        ('ullAvailExtendedVirtual', ctypes.c_ulonglong)]
+
+        status = MEMORYSTATUSEX(dwLength=ctypes.sizeof(MEMORYSTATUSEX))
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullTotalPhys // (1024 * 1024), status.ullAvailPhys // (1024 * 1024)
+    try:
+        page = os.sysconf('SC_PAGE_SIZE')
+        return (os.sysconf('SC_PHYS_PAGES') * page // (1024 * 1024),
+                os.sysconf('SC_AVPHYS_PAGES') * page // (1024 * 1024))
+    except (ValueError, OSError, AttributeError):
+        return None, None
+
+
+def gradle_jvm_args() -> str:
+    """JVM flags for one build's Gradle daemon, sized to its admission reservation."""
+    return (f'-Xmx{BuildConfig.BUILD_JVM_HEAP_MB}m -XX:MaxMetaspaceSize=512m '
+            f'-XX:+HeapDumpOnOutOfMemoryError -Dfile.encoding=UTF-8')
+
+
+def gradle_env() -> dict:
+    """Process environment for flutter builds; the daemon itself is capped by org.gradle.jvmargs."""
+    env = dict(os.environ)
+    env['GRADLE_OPTS'] = f'-Xmx{BuildConfig.BUILD_CLIENT_HEAP_MB}m'
+    return env
+
+
+class BuildExecutor:
+    """Admits Gradle builds while the machine has cores and memory for them; the rest wait in FIFO order.
+
+    Every running build reserves BUILD_CPUS cores and BUILD_MEMORY_MB of memory. A build is
+    admitted when the reservations fit the machine and the memory currently available still
+    covers one more build, so other tenants on the box are accounted for too.
+    """
+
+    def __init__(self, cpus_per_build: int = None, memory_per_build: int = None, max_parallel: int = None):
+        self.cpus_per_build = cpus_per_build or BuildConfig.BUILD_CPUS
+        self.memory_per_build = memory_per_build or BuildConfig.BUILD_MEMORY_MB
+        self.max_parallel = BuildConfig.BUILD_MAX_PARALLEL if max_parallel is None else max_parallel
+        self._condition = threading.Condition()
+        self._issued = 0
+        self._next_ticket = 0
+        self._running = {}
+
+    def capacity(self) -> int:
+        """Builds this machine can run at once, from its core count and total memory."""
+        by_cpu = max(1, (os.cpu_count() or 1) // self.cpus_per_build)
+        total, _ = memory_mb()
+        by_memory = by_cpu if total is None else max(1, (total - BuildConfig.BUILD_MEMORY_HEADROOM_MB) // self.memory_per_build)
+        limit = min(by_cpu, by_memory)
+        return min(limit, self.max_parallel) if self.max_parallel > 0 else limit
+
+    @contextmanager
+    def admit(self, session_id: str):
+        """Block until the build may start; the slot is held for the duration of the with block."""
+        with metrics.span('build admission', 'queue', session_id), self._condition:
+            ticket = self._issued
+            self._issued += 1
+            announced = False
+            while not (ticket == self._next_ticket and self._fits()):
+                if not announced:
+                    print(f"⏳ Build for {session_id} queued ({len(self._running)} running, capacity {self.capacity()})")
+                    announced = True
+                # Memory frees up without a notification when other processes exit, so re-check periodically
+                self._condition.wait(timeout=2.0)
+            self._next_ticket += 1
+            self._running[ticket] = session_id
+            self._condition.notify_all()
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                del self._running[ticket]
+                self._condition.notify_all()
+
+    def status(self) -> dict:
+        with self._condition:
+            return {
+                'running': len(self._running),
+                'queued': self._issued - self._next_ticket,
+                'capacity': self.capacity(),
+            }
+
+    def _fits(self) -> bool:
+        if not self._running:
+            # A lone build always runs, even on a machine smaller than the reservation
+            return True
+        if len(self._running) >= self.capacity():
+            return False
+        _, available = memory_mb()
+        return available is None or available - BuildConfig.BUILD_MEMORY_HEADROOM_MB >= self.memory_per_build
+
+
+build_executor = BuildExecutor()
@@ -0,0 +1,226 @@
+import os
+import re
+import copy
+import yaml
+from xml.etree import ElementTree as ET
+from services.architecture_library import BLUETOOTH_DEPENDENCIES, CHART_DEPENDENCIES
+from services.file_utils import write_if_changed
+from services.dependency_mirror import dependency_mirror
+from services.build_executor import gradle_jvm_args
+from config import BuildConfig
+
+ANDROID_NS = 'http://schemas.android.com/apk/res/android'
+ET.register_namespace('android', ANDROID_NS)
+ET.register_namespace('tools', 'http://schemas.android.com/tools')
+
+# Complete list of Bluetooth permissions for modern Android
+BLUETOOTH_MANIFEST_ENTRIES = [
+    {'tag': 'uses-permission', 'name': 'android.permission.BLUETOOTH'},
+    {'tag': 'uses-permission', 'name': 'android.permission.BLUETOOTH_ADMIN'},
+    {'tag': 'uses-permission', 'name': 'android.permission.BLUETOOTH_SCAN', 'usesPermissionFlags': 'neverForLocation'},
+    {'tag': 'uses-permission', 'name': 'android.permission.BLUETOOTH_CONNECT'},
+    {'tag': 'uses-permission', 'name': 'android.permission.ACCESS_FINE_LOCATION'},
+    {'tag': 'uses-permission', 'name': 'android.permission.ACCESS_COARSE_LOCATION'},
+    {'tag': 'uses-feature', 'name': 'android.hardware.bluetooth', 'required': 'false'},
+    {'tag': 'uses-feature', 'name': 'android.hardware.bluetooth_le', 'required': 'false'},
+]
+
+# Gradle keys: (block they live in, accepted spellings, preferred Groovy spelling)
+GRADLE_APP_KEYS = {
+    'compileSdk': ('android', ('compileSdk', 'compileSdkVersion'), 'compileSdk'),
+    'minSdk': ('defaultConfig', ('minSdk', 'minSdkVersion'), 'minSdkVersion'),
+    'targetSdk': ('defaultConfig', ('targetSdk', 'targetSdkVersion'), 'targetSdkVersion'),
+    'multiDexEnabled': ('defaultConfig', ('multiDexEnabled',), 'multiDexEnabled'),
+}
+
+
+class ConfigPlanner:
+    """Collects the desired end state of pubspec, manifest and Gradle files and writes each once.
+
+    A plan is a plain JSON-able dict kept in the state as `config_plan`, so every stage
+    applies the same end state and a file is only rewritten when its content would change.
+    """
+
+    def plan(self, app_name: str, requirements: dict) -> dict:
+        plan = {}
+        for contribution in (self._project_contribution(app_name), self._build_contribution(requirements),
+                             self._mirror_contribution()):
+            self._merge(plan, contribution)
+        return plan
+
+    def apply(self, project_path: str, plan: dict) -> list:
+        """Bring the project's config files to the planned state; return the files written."""
+        written = []
+        app_gradle = self._gradle_script(project_path, 'android/app/build.gradle')
+        project_gradle = self._gradle_script(project_path, 'android/build.gradle')
+        settings_gradle = self._gradle_script(project_path, 'android/settings.gradle')
+        for rel_path, render in (('pubspec.yaml', self._render_pubspec),
+                                 ('android/gradle.properties', self._render_gradle_properties),
+                                 ('android/app/src/main/AndroidManifest.xml', self._render_manifest),
+                                 (app_gradle, self._render_app_gradle),
+                                 (project_gradle, self._render_project_gradle),
+                                 (settings_gradle, self._render_settings_gradle)):
+            path = os.path.join(project_path, rel_path)
+            if not os.path.exists(path):
+                continue
+            with open(path, 'r', encoding='utf-8', newline='') as f:
+                current = f.read()
+            content = render(current, plan, rel_path.endswith('.kts'))
+            if content != current and write_if_changed(path, content):
+                written.append(rel_path)
+        if written:
+            print(f"✅ Config plan applied: {', '.join(written)}")
+        else:
+            print("⚡ Config files already match the plan")
+        return written
+
+    def _project_contribution(self, app_name: str) -> dict:
+        return {
+            'pubspec': {
+                'name': app_name,
+                'description': 'A Flutter application.',
+                'publish_to': 'none',
+                'version': '1.0.0+1',
+                'environment': {'sdk': '>=3.2.0 <4.0.0'},
+                'dependencies': {'flutter': {'sdk': 'flutter'}},
+                'dev_dependencies': {'flutter_test': {'sdk': 'flutter'}, 'flutter_lints': '^3.0.0'},
+                'flutter': {'uses-material-design': True},
+            },
+            # API 34 is the newest level AGP 8.1.4 (pinned in _build_contribution) supports
+            'gradle_app': {'compileSdk': 34, 'minSdk': 21, 'targetSdk': 34},
+        }
+
+    def _build_contribution(self, requirements: dict) -> dict:
+        # The build stage's pinned packages are authoritative: they replace every other dependency
+        dependencies = {'flutter': {'sdk': 'flutter'}}
+        dependencies.update(BLUETOOTH_DEPENDENCIES)
+        if requirements.get('sensor_types'):
+            dependencies.update(CHART_DEPENDENCIES)
+        return {
+            'pubspec': {'dependencies': dependencies},
+            'manifest': copy.deepcopy(BLUETOOTH_MANIFEST_ENTRIES),
+            'gradle_app': {'multiDexEnabled': True},
+            'gradle_project': {'agp_version': '8.1.4', 'kotlin_version': '1.9.10'},
+            # Keep each build inside the memory and cores the build executor reserved for it
+            'gradle_properties': {
+                'org.gradle.jvmargs': gradle_jvm_args(),
+                'org.gradle.workers.max': str(BuildConfig.BUILD_CPUS),
+            },
+        }
+
+    def _mirror_contribution(self) -> dict:
+        maven_url = dependency_mirror.maven_url()
+        return {'gradle_repositories': [maven_url]} if maven_url else {}
+
+    def _merge(self, base: dict, overlay: dict):
+        for key, value in overlay.items():
+            if key == 'dependencies' or not isinstance(value, dict) or not isinstance(base.get(key), dict):
+                base[key] = copy.deepcopy(value)
+            else:
+                self._merge(base[key], value)
+
+    def _render_pubspec(self, current: str, plan: dict, kotlin: bool) -> str:
+        planned = plan.get('pubspec', {})
+        document = yaml.safe_load(current) or {}
+        updated = dict(document)
+        updated.update(planned)
+        if updated == document:
+            return current
+        return yaml.safe_dump(updated, sort_keys=False, default_flow_style=False)
+
+    def _render_manifest(self, current: str, plan: dict, kotlin: bool) -> str:
+        parser = ET.XMLParser(target=ET.TreeBuilder(insert_comments=True))
+        root = ET.fromstring(current, parser=parser)
+        name_attr = f'{{{ANDROID_NS}}}name'
+        present = {(child.tag, child.get(name_attr)) for child in root}
+
+        missing = [entry for entry in plan.get('manifest', []) if (entry['tag'], entry['name']) not in present]
+        if not missing:
+            return current
+
+        # New entries go before <application>, indented like the existing children
+        children = list(root)
+        index = next((i for i, child in enumerate(children) if child.tag == 'application'), len(children))
+        indent = (root.text or '\n    ') if index == 0 else (children[index - 1].tail or '\n    ')
+        for offset, entry in enumerate(missing):
+            element = ET.Element(entry['tag'], {f'{{{ANDROID_NS}}}{key}': value
+                                                for key, value in entry.items() if key != 'tag'})
+            element.tail = indent
+            root.insert(index + offset, element)
+        if index == 0:
+            root.text = indent
+        else:
+            children[index - 1].tail = indent
+        # Declarations and comments outside the root element are carried over verbatim
+        prologue = current[:current.index('<manifest')]
+        return prologue + ET.tostring(root, encoding='unicode') + '\n'
+
+    def _render_gradle_properties(self, current: str, plan: dict, kotlin: bool) -> str:
+        pending = dict(plan.get('gradle_properties', {}))
+        lines = current.splitlines()
+        for index, line in enumerate(lines):
+            key = line.split('=', 1)[0].strip()
+            if '=' in line and not line.lstrip().startswith('#') and key in pending:
+                lines[index] = f'{key}={pending.pop(key)}'
+        lines.extend(f'{key}={value}' for key, value in pending.items())
+        return '\n'.join(lines) + '\n'
+
+    def _gradle_script(self, project_path: str, groovy_script: str) -> str:
+        kotlin_script = groovy_script + '.kts'
+        if os.path.exists(os.path.join(project_path, kotlin_script)):
+            return kotlin_script
+        return groovy_script
+
+    def _render_app_gradle(self, current: str, plan: dict, kotlin: bool) -> str:
+        content = current
+        for key, value in plan.get('gradle_app', {}).items():
+            content = self._set_gradle_key(content, key, value, kotlin)
+        return content
+
+    def _set_gradle_key(self, content: str, key: str, value, kotlin: bool) -> str:
+        block, spellings, preferred = GRADLE_APP_KEYS[key]
+        literal = str(value).lower() if isinstance(value, bool) else str(value)
+        names = '|'.join(sorted(spellings, key=len, reverse=True))
+        existing = re.compile(rf'^([ \t]*)({names})([ \t]*=[ \t]*|[ \t]+)(\S.*)$', re.MULTILINE)
+        if existing.search(content):
+            return existing.sub(lambda m: f'{m.group(1)}{m.group(2)}{m.group(3)}{literal}', content)
+
+        opening = re.search(rf'^([ \t]*){block}[ \t]*\{{[^\n]*$', content, re.MULTILINE)
+        if not opening:
+            return content
+        # Kotlin scripts assign properties; Groovy scripts accept the bare method-call form
+        setter = f'{spellings[0]} = {literal}' if kotlin else f'{preferred} {literal}'
+        line = f'\n{opening.group(1)}    {setter}'
+        return content[:opening.end()] + line + content[opening.end():]
+
+    def _render_project_gradle(self, current: str, plan: dict, kotlin: bool) -> str:
+        settings = plan.get('gradle_project', {})
+        content = current
+        if 'agp_version' in settings:
+            content = re.sub(r"^.*com\.android\.tools\.build:gradle:.*$",
+                             f"        classpath 'com.android.tools.build:gradle:{settings['agp_version']}'",
+                             content, flags=re.MULTILINE)
+        if 'kotlin_version' in settings:
+            content = re.sub(r"^.*ext\.kotlin_version.*$",
+                             f"    ext.kotlin_version = '{settings['kotlin_version']}'",
+                             content, flags=re.MULTILINE)
+        return self._add_repositories(content, plan, kotlin)
+
+    def _render_settings_gradle(self, current: str, plan: dict, kotlin: bool) -> str:
+        return self._add_repositories(current, plan, kotlin)
+
+    def _add_repositories(self, content: str, plan: dict, kotlin: bool) -> str:
+        """Put the planned Maven repositories first in every repositories block, so they win lookups."""
+        for url in reversed(plan.get('gradle_repositories', [])):
+            if url in content:
+                continue
+            if kotlin:
+                declaration = f'maven {{ url = uri("{url}"); isAllowInsecureProtocol = true }}'
+            else:
+                declaration = f"maven {{ url '{url}'; allowInsecureProtocol = true }}"
+            content = re.sub(r'^([ \t]*)repositories[ \t]*\{[ \t]*$',
+                             lambda m: f'{m.group(0)}\n{m.group(1)}    {declaration}', content, flags=re.MULTILINE)
+        return content
+
+
+config_planner = ConfigPlanner()
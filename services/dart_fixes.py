@@ -0,0 +1,63 @@
+import re
+from services.rewrite_engine import Rule, RewriteEngine
+
+REQUIRED_IMPORTS = (
+    "import 'package:flutter/material.dart';",
+    "import 'package:flutter_blue_plus/flutter_blue_plus.dart';",
+    "import 'package:permission_handler/permission_handler.dart';",
+    "import 'dart:io';",
+)
+
+REQUIRED_STATE_VARIABLES = (
+    'List<ScanResult> scanResults = [];',
+    'BluetoothDevice? connectedDevice;',
+    'BluetoothCharacteristic? writeCharacteristic;',
+    'bool isScanning = false;',
+    'bool isConnecting = false;',
+    'String connectionStatus = "Ready to scan";',
+    'bool permissionsGranted = false;',
+    'int dataPackets = 0;',
+    'String deviceId = "Unknown";',
+)
+
+PERMISSION_CALLBACK = r'\g<0>\n    WidgetsBinding.instance.addPostFrameCallback((_) {\n      requestPermissions();\n    });'
+
+
+def _missing_variables(code: str) -> list:
+    return [var for var in REQUIRED_STATE_VARIABLES if var not in code]
+
+
+def _declare_missing_variables(class_header: str, code: str) -> str:
+    # Each declaration goes directly after the header, so the last one ends up first
+    return class_header + ''.join(f'\n  {var}' for var in reversed(_missing_variables(code)))
+
+
+# Deprecated or hallucinated APIs in model-written Flutter code
+SMART_API_RULES = [
+    Rule('devices_assignment', r'_devices\s*=.*?results.*?\.toList\(\);', 'setState(() { scanResults = results; });'),
+    Rule('devices_rename', r'_devices', 'scanResults'),
+    Rule('button_primary', r'primary:\s*(Colors\.\w+)', r'backgroundColor: \1'),
+    Rule('button_on_primary', r'onPrimary:\s*(Colors\.\w+)', r'foregroundColor: \1'),
+    Rule('uint8list_parse', re.escape('Uint8List.fromList([int.parse(command)])'), 'command.codeUnits'),
+    Rule('uint8list_code_units', re.escape('Uint8List.fromList(command.codeUnits)'), 'command.codeUnits'),
+    Rule('flutter_blue_field', re.escape('_flutterBlue.'), 'FlutterBluePlus.'),
+    Rule('card_theme', re.escape('CardTheme('), 'CardThemeData('),
+    Rule('elevated_button_theme', re.escape('ElevatedButtonTheme('), 'ElevatedButtonThemeData('),
+]
+
+# Last line of defence before a build: permissions, state fields and API compatibility
+BULLETPROOF_RULES = [
+    Rule('permission_request', r'super\.initState\(\);', PERMISSION_CALLBACK,
+         when=lambda code: 'requestPermissions();' not in code),
+    Rule('state_variables', r'class _\w*State extends State<\w+>\s*\{', _declare_missing_variables,
+         when=lambda code: bool(_missing_variables(code))),
+    # One rule so a doubled prefix followed by .instance collapses in a single pass, as the chained replaces did
+    Rule('flutter_blue_instance', r'FlutterBluePlus\.(?:(?:FlutterBluePlus\.)+(?:instance\.)?|instance\.)', 'FlutterBluePlus.'),
+    Rule('devices_rename', r'_devices', 'scanResults'),
+    Rule('button_primary', r'primary:\s*(Colors\.\w+)', r'backgroundColor: \1'),
+    Rule('button_on_primary', r'onPrimary:\s*(Colors\.\w+)', r'foregroundColor: \1'),
+    Rule('uint8list', r'Uint8List\.fromList\([^)]+\)', 'command.codeUnits'),
+]
+
+smart_api_fixes = RewriteEngine('smart_api_fixes', SMART_API_RULES, REQUIRED_IMPORTS)
+bulletproof_fixes = RewriteEngine('bulletproof_fixes', BULLETPROOF_RULES, REQUIRED_IMPORTS)
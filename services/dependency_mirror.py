@@ -0,0 +1,336 @@
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+import posixpath
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from config import MirrorConfig
+from services.architecture_library import BLUETOOTH_DEPENDENCIES, CHART_DEPENDENCIES
+
+# Everything the generator can put into a project; seeding resolves these and their transitive pub deps
+MIRROR_MANIFEST = {
+    'pub': dict(BLUETOOTH_DEPENDENCIES, **CHART_DEPENDENCIES),
+    'maven': [
+        'com.android.tools.build:gradle:8.1.4',
+        'org.jetbrains.kotlin:kotlin-gradle-plugin:1.9.10',
+        'org.jetbrains.kotlin:kotlin-stdlib:1.9.10',
+    ],
+}
+
+PUB_NAME = re.compile(r'^[a-z0-9_]+$')
+PUB_VERSION = re.compile(r'^[0-9A-Za-z.+\-]+$')
+VERSION_PARTS = re.compile(r'^(\d+)\.(\d+)\.(\d+)(-[0-9A-Za-z.\-]+)?(\+[0-9A-Za-z.\-]+)?$')
+PUB_MEDIA_TYPE = 'application/vnd.pub.v2+json'
+
+
+def parse_version(version: str):
+    """Sortable key for a pub version; prereleases sort before their release."""
+    match = VERSION_PARTS.match(version)
+    if not match:
+        return None
+    major, minor, patch = (int(part) for part in match.group(1, 2, 3))
+    return (major, minor, patch, match.group(4) is None, match.group(4) or '')
+
+
+def version_allows(constraint, version: str) -> bool:
+    """Check a version against a pub constraint (any, exact, ^caret or >=/>/<=/< ranges)."""
+    key = parse_version(version)
+    if key is None:
+        return False
+    if constraint is None or constraint.strip() in ('', 'any'):
+        return True
+    release = key[:3]
+    for term in constraint.split():
+        if term.startswith('^'):
+            low = parse_version(term[1:])
+            if low is None or key < low:
+                return False
+            major, minor, patch = low[:3]
+            high = (major + 1, 0, 0) if major else ((0, minor + 1, 0) if minor else (0, 0, patch + 1))
+            if release >= high:
+                return False
+            continue
+        operator = re.match(r'^(>=|<=|>|<)?(.+)$', term)
+        bound = parse_version(operator.group(2))
+        if bound is None:
+            return False
+        op = operator.group(1)
+        if op == '>=' and key < bound or op == '>' and key <= bound or op == '<=' and key > bound:
+            return False
+        # As in pub, <2.0.0 also excludes the 2.0.0 prereleases
+        if op == '<' and (key >= bound or release == bound[:3]):
+            return False
+        if op is None and key != bound:
+            return False
+    return True
+
+
+class DependencyMirror:
+    """Localhost pull-through mirror for pub.dev packages and Maven repositories.
+
+    Hits are served from MIRROR_DIR; misses are fetched once from upstream and kept, so after
+    one online build (or a seed) every later build resolves without leaving the machine.
+    """
+
+    def __init__(self, root: str = None):
+        self.root = root or MirrorConfig.MIRROR_DIR
+        self.offline = MirrorConfig.MIRROR_OFFLINE
+        self.base_url = None
+        self._server = None
+        self._lock = threading.Lock()
+        self._fetch_locks = {}
+        # Upstream paths that 404'd everywhere, so Gradle's repository probing stays local
+        self._missing = set()
+
+    def start(self):
+        """Start serving (once per process) and point pub at the mirror; returns the base URL or None."""
+        if not MirrorConfig.DEPENDENCY_MIRROR_ENABLED:
+            return None
+        with self._lock:
+            if self._server is not None:
+                return self.base_url
+            try:
+                server = self._bind()
+            except OSError as e:
+                print(f"⚠️ Dependency mirror could not start: {e}")
+                return None
+            self._server = server
+            host, port = server.server_address[:2]
+            self.base_url = f'http://{host}:{port}'
+            threading.Thread(target=server.serve_forever, name='dependency-mirror', daemon=True).start()
+
+        os.environ['PUB_HOSTED_URL'] = self.pub_url()
+        print(f"📦 Dependency mirror serving {self.root} at {self.base_url}{' (offline)' if self.offline else ''}")
+        if MirrorConfig.MIRROR_SEED_ON_START and not self.offline:
+            threading.Thread(target=self._seed_quietly, name='mirror-seed', daemon=True).start()
+        return self.base_url
+
+    def pub_url(self) -> str:
+        return f'{self.base_url}/pub'
+
+    def maven_url(self):
+        """Maven repository URL for Gradle; None until start() has run or when the mirror is disabled."""
+        return f'{self.base_url}/maven' if self.base_url else None
+
+    def seed(self, manifest: dict = None):
+        """Mirror every manifest package with its transitive pub dependencies, and the Maven artifacts."""
+        manifest = manifest or MIRROR_MANIFEST
+        seen = set()
+        for name, constraint in manifest.get('pub', {}).items():
+            self._seed_pub(name, constraint, seen)
+        for coordinate in manifest.get('maven', []):
+            self._seed_maven(coordinate)
+        print(f"✅ Dependency mirror seeded: {len(seen)} pub packages, {len(manifest.get('maven', []))} Maven artifacts")
+
+    def _seed_quietly(self):
+        try:
+            self.seed()
+        except Exception as e:
+            print(f"⚠️ Dependency mirror seed incomplete: {e}")
+
+    def _seed_pub(self, name: str, constraint, seen: set):
+        if name in seen:
+            return
+        seen.add(name)
+        listing = self._pub_listing(name)
+        if listing is None:
+            raise Exception(f"pub package '{name}' not found upstream")
+        candidates = [entry for entry in listing.get('versions', [])
+                      if not entry.get('retracted') and version_allows(constraint, entry['version'])]
+        releases = [entry for entry in candidates if parse_version(entry['version'])[3]]
+        chosen = max(releases or candidates, key=lambda entry: parse_version(entry['version']), default=None)
+        if chosen is None:
+            raise Exception(f"no version of '{name}' matches '{constraint}'")
+        self._pub_archive(name, chosen['version'])
+
+        for dependency, spec in (chosen.get('pubspec', {}).get('dependencies') or {}).items():
+            if isinstance(spec, dict):
+                if 'sdk' in spec or 'path' in spec or 'git' in spec:
+                    continue
+                spec = spec.get('version')
+            self._seed_pub(dependency, spec, seen)
+
+    def _seed_maven(self, coordinate: str):
+        group, artifact, version = coordinate.split(':')[:3]
+        base = f"{group.replace('.', '/')}/{artifact}/{version}/{artifact}-{version}"
+        if self._maven_file(f'{base}.pom') is None:
+            raise Exception(f"Maven artifact '{coordinate}' not found upstream")
+        if self._maven_file(f'{base}.jar') is None:
+            self._maven_file(f'{base}.aar')
+
+    # --- pub hosted repository -------------------------------------------------------------
+
+    def _pub_listing(self, name: str):
+        path = os.path.join(self.root, 'pub', 'api', f'{name}.json')
+        # Listings change with every publish, unlike archives and Maven files, so they expire
+        self._fetch(path, [f'{MirrorConfig.PUB_UPSTREAM_URL}/api/packages/{name}'], headers={'Accept': PUB_MEDIA_TYPE},
+                    max_age=MirrorConfig.MIRROR_LISTING_TTL)
+        if not os.path.isfile(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _pub_archive(self, name: str, version: str):
+        path = os.path.join(self.root, 'pub', 'archives', f'{name}-{version}.tar.gz')
+        if os.path.isfile(path):
+            return path
+        listing = self._pub_listing(name) or {}
+        entry = next((entry for entry in listing.get('versions', []) if entry['version'] == version), None)
+        if entry is None:
+            return None
+        self._fetch(path, [entry.get('archive_url') or
+                           f'{MirrorConfig.PUB_UPSTREAM_URL}/packages/{name}/versions/{version}.tar.gz'],
+                    sha256=entry.get('archive_sha256'))
+        return path if os.path.isfile(path) else None
+
+    def serve_pub_listing(self, name: str):
+        """Listing with archive URLs pointing back at the mirror; offline it only offers mirrored versions."""
+        listing = self._pub_listing(name)
+        if listing is None:
+            return None
+        listing = dict(listing)
+        versions = []
+        for entry in listing.get('versions', []):
+            archive = os.path.join(self.root, 'pub', 'archives', f"{name}-{entry['version']}.tar.gz")
+            if self.offline and not os.path.isfile(archive):
+                continue
+            entry = dict(entry, archive_url=f"{self.pub_url()}/packages/{name}/versions/{entry['version']}.tar.gz")
+            versions.append(entry)
+        if not versions:
+            return None
+        listing['versions'] = versions
+        listing['latest'] = max(versions, key=lambda entry: parse_version(entry['version']) or (0,))
+        return json.dumps(listing).encode('utf-8')
+
+    # --- Maven repository ------------------------------------------------------------------
+
+    def _maven_file(self, rel_path: str):
+        path = os.path.join(self.root, 'maven', *rel_path.split('/'))
+        self._fetch(path, [f'{upstream}/{rel_path}' for upstream in MirrorConfig.MAVEN_UPSTREAM_URLS])
+        return path if os.path.isfile(path) else None
+
+    # --- upstream fetching -----------------------------------------------------------------
+
+    def _fetch(self, path: str, urls: list, headers: dict = None, sha256: str = None, max_age: int = None):
+        """Download the first available URL to path unless it is already mirrored (and younger than max_age)."""
+        if self._is_fresh(path, max_age) or self.offline or path in self._missing:
+            return
+        with self._lock:
+            fetch_lock = self._fetch_locks.setdefault(path, threading.Lock())
+        with fetch_lock:
+            if self._is_fresh(path, max_age):
+                return
+            stale = os.path.isfile(path)
+            for url in urls:
+                try:
+                    self._download(url, path, headers or {}, sha256)
+                    return
+                except urllib.error.HTTPError as e:
+                    if e.code in (403, 404):
+                        continue
+                    if not stale:
+                        raise
+                    print(f"⚠️ Could not refresh {url}, serving the mirrored copy: {e}")
+                    break
+                except (urllib.error.URLError, OSError) as e:
+                    if not stale:
+                        raise
+                    print(f"⚠️ Could not refresh {url}, serving the mirrored copy: {e}")
+                    break
+            if stale:
+                # Keep serving the copy we have and only retry upstream once it expires again
+                os.utime(path)
+            else:
+                self._missing.add(path)
+
+    def _is_fresh(self, path: str, max_age: int = None) -> bool:
+        try:
+            modified = os.path.getmtime(path)
+        except OSError:
+            return False
+        return not max_age or time.time() - modified < max_age
+
+    def _download(self, url: str, path: str, headers: dict, sha256: str = None):
+        request = urllib.request.Request(url, headers=dict(headers, **{'User-Agent': 'flutter-app-generator-mirror'}))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.fetch-')
+        try:
+            digest = hashlib.sha256()
+            with urllib.request.urlopen(request, timeout=MirrorConfig.MIRROR_FETCH_TIMEOUT) as response, \
+                    os.fdopen(fd, 'wb') as f:
+                while True:
+                    chunk = response.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    f.write(chunk)
+            if sha256 and digest.hexdigest() != sha256:
+                raise Exception(f"Checksum mismatch for {url}")
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    # --- HTTP front end --------------------------------------------------------------------
+
+    def _bind(self):
+        mirror = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                mirror._handle(self, send_body=True)
+
+            def do_HEAD(self):
+                mirror._handle(self, send_body=False)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            server = ThreadingHTTPServer((MirrorConfig.MIRROR_HOST, MirrorConfig.MIRROR_PORT), Handler)
+        except OSError:
+            # Port taken (e.g. a second worker process): any free port still works, the lockfile just re-resolves
+            server = ThreadingHTTPServer((MirrorConfig.MIRROR_HOST, 0), Handler)
+        server.daemon_threads = True
+        return server
+
+    def _handle(self, request: BaseHTTPRequestHandler, send_body: bool):
+        path = posixpath.normpath(request.path.split('?', 1)[0])
+        try:
+            body, file_path, content_type = None, None, 'application/octet-stream'
+            parts = path.strip('/').split('/')
+            if parts[:3] == ['pub', 'api', 'packages'] and len(parts) == 4 and PUB_NAME.match(parts[3]):
+                body, content_type = self.serve_pub_listing(parts[3]), PUB_MEDIA_TYPE
+            elif parts[:2] == ['pub', 'packages'] and len(parts) == 5 and parts[3] == 'versions' \
+                    and PUB_NAME.match(parts[2]) and parts[4].endswith('.tar.gz') \
+                    and PUB_VERSION.match(parts[4][:-len('.tar.gz')]):
+                file_path = self._pub_archive(parts[2], parts[4][:-len('.tar.gz')])
+            elif parts[0] == 'maven' and len(parts) > 1 and '..' not in parts:
+                file_path = self._maven_file('/'.join(parts[1:]))
+
+            if body is None and file_path is None:
+                request.send_error(404)
+                return
+            request.send_response(200)
+            request.send_header('Content-Type', content_type)
+            request.send_header('Content-Length', str(len(body) if body is not None else os.path.getsize(file_path)))
+            request.end_headers()
+            if not send_body:
+                return
+            if body is not None:
+                request.wfile.write(body)
+            else:
+                with open(file_path, 'rb') as f:
+                    shutil.copyfileobj(f, request.wfile)
+        except Exception as e:
+            print(f"⚠️ Dependency mirror failed for {path}: {e}")
+            request.send_error(502)
+
+
+dependency_mirror = DependencyMirror()
@@ -0,0 +1,226 @@
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Tuple
+
+# Keyword groups shared by the prompt analyzer and the code generator
+KEYWORDS = {
+    'button': ('button', 'on off', 'turn on', 'turn off', 'switch', 'toggle', 'control'),
+    'button_exclude': ('monitor', 'station', 'sensor', 'data', 'read', 'receive', 'logging'),
+    'brightness': ('brightness control', 'brightness slider', 'dimmer', 'light control', 'intensity control'),
+    'brightness_exclude': ('sensor', 'monitoring', 'station', 'environmental', 'light sensor', 'monitor'),
+    'speed': ('speed', 'fast', 'slow', 'rate', 'velocity'),
+    'rgb': ('rgb control', 'color control', 'colour control', 'red green blue control'),
+    'rgb_exclude': ('monitor', 'station', 'sensor', 'environmental'),
+    'temperature': ('temperature', 'temp', 'dht11', 'thermal'),
+    'humidity': ('humidity', 'humid', 'dht11', 'moisture'),
+    'light_sensor': ('light sensor', 'ldr', 'brightness sensor', 'ambient light'),
+    'distance': ('distance', 'ultrasonic', 'range', 'proximity'),
+    'motion': ('motion', 'accelerometer', 'gyroscope', 'imu', 'movement'),
+    'moisture': ('moisture', 'soil', 'water level', 'wet', 'dry'),
+    'joystick': ('joystick', 'analog stick', 'game pad'),
+    'servo': ('servo position', 'servo angle', 'position control', 'angle control', 'servo slider'),
+    'servo_exclude': ('on off', 'on and off', 'turn on', 'turn off'),
+    'general_sensor': ('sensor', 'data', 'reading'),
+    'neopixel_name': ('neopixel', 'led', 'light'),
+    'device_control': ('on', 'off', 'control', 'switch', 'toggle'),
+}
+
+# Devices that get default ON/OFF commands, in command-numbering order
+DEVICE_KEYWORDS = {
+    'relay': ('relay', 'switch relay', 'relay control'),
+    'neopixel': ('neopixel', 'neo pixel', 'neopixels', 'rgb led', 'led strip'),
+    'servo': ('servo', 'servo motor', 'motor servo'),
+    'buzzer': ('buzzer', 'beeper', 'alarm sound', 'sound'),
+    'laser': ('laser', 'laser pointer', 'light beam'),
+    'motor': ('motor', 'dc motor', 'stepper motor'),
+    'led': ('led', 'light', 'lamp'),
+}
+
+# Looser mapping used to attribute a hardware-commands line to a device, in priority order
+CONTEXT_DEVICE_KEYWORDS = {
+    'relay': ('relay', 'switch'),
+    'neopixel': ('neopixel', 'led', 'rgb'),
+    'servo': ('servo', 'motor'),
+    'buzzer': ('buzzer', 'beep'),
+    'laser': ('laser', 'light'),
+}
+
+# Inflections accepted after a keyword ("leds", "controller", "monitoring")
+SHORT_SUFFIXES = ('es', 's')
+LONG_SUFFIXES = ('lers', 'ling', 'ers', 'ing', 'ler', 'led', 'es', 'ed', 'er', 's')
+
+
+@dataclass(frozen=True)
+class FeatureSet:
+    """Everything the pipeline derives from the wording of a prompt."""
+    devices: Tuple[str, ...]
+    context_devices: Tuple[str, ...]
+    has_buttons: bool
+    has_brightness: bool
+    has_speed: bool
+    has_rgb: bool
+    has_temperature: bool
+    has_humidity: bool
+    has_light: bool
+    has_distance: bool
+    has_motion: bool
+    has_moisture: bool
+    has_joystick: bool
+    has_servo: bool
+    has_general_sensor: bool
+    mentions_neopixel: bool
+
+    @property
+    def has_sliders(self) -> bool:
+        return self.has_brightness or self.has_speed or self.has_rgb or self.has_servo
+
+    @property
+    def sensor_types(self) -> list:
+        sensor_types = []
+        if self.has_temperature:
+            sensor_types.append('temperature')
+        if self.has_humidity:
+            sensor_types.append('humidity')
+        if self.has_general_sensor:
+            sensor_types.append('general_sensor')
+        return sensor_types
+
+    @property
+    def control_types(self) -> list:
+        control_types = []
+        if self.has_buttons:
+            control_types.append('buttons')
+        if self.has_sliders:
+            control_types.append('sliders')
+        return control_types
+
+
+# Words are runs of letters and digits; "_", "-" and punctuation separate them ("RELAY_START")
+WORD = re.compile(r'[^\W_]+')
+SEPARATORS = str.maketrans({chr(code): ' ' for code in range(128) if not chr(code).isalnum()})
+
+
+def _suffixes(phrase: str) -> tuple:
+    return LONG_SUFFIXES if len(phrase) >= 4 else SHORT_SUFFIXES
+
+
+def _build_matcher():
+    """Index every keyword phrase by the spellings it matches, inflections included."""
+    phrase_tags = {}
+    for group, phrases in KEYWORDS.items():
+        for phrase in phrases:
+            phrase_tags.setdefault(phrase, set()).add(group)
+    for device, phrases in DEVICE_KEYWORDS.items():
+        for phrase in phrases:
+            phrase_tags.setdefault(phrase, set()).add(f'device:{device}')
+    for device, phrases in CONTEXT_DEVICE_KEYWORDS.items():
+        for phrase in phrases:
+            phrase_tags.setdefault(phrase, set()).add(f'context:{device}')
+
+    # An exact phrase wins over an inflection of a shorter one; then suffixes in LONG_SUFFIXES order
+    forms = {phrase: phrase for phrase in phrase_tags}
+    for suffix in LONG_SUFFIXES:
+        for phrase in phrase_tags:
+            if suffix in _suffixes(phrase):
+                forms.setdefault(phrase + suffix, phrase)
+
+    word_forms = {form: phrase for form, phrase in forms.items() if ' ' not in form}
+    # Multi-word phrases with the leading words that must all occur, and each spelling with its last word
+    phrase_forms = {}
+    for form, phrase in forms.items():
+        if ' ' in form:
+            leading = frozenset(phrase.split()[:-1])
+            phrase_forms.setdefault(phrase, (phrase, leading, []))[2].append((form, form.split()[-1]))
+    return {phrase: frozenset(tags) for phrase, tags in phrase_tags.items()}, word_forms, list(phrase_forms.values())
+
+
+_PHRASE_TAGS, _WORD_FORMS, _PHRASE_FORMS = _build_matcher()
+
+
+def _single_spaced(text: str) -> bool:
+    # Most prompts need no whitespace normalisation; these scans are far cheaper than the rebuild
+    return text.isascii() and not ('  ' in text or '\n' in text or '\t' in text or '\r' in text
+                                   or '\x0b' in text or '\x0c' in text)
+
+
+def _contains_phrase(spaced: str, form: str) -> bool:
+    """Whether form occurs in the whitespace-normalised text as whole words."""
+    start = spaced.find(form)
+    while start != -1:
+        end = start + len(form)
+        if (start == 0 or not spaced[start - 1].isalnum()) and (end == len(spaced) or not spaced[end].isalnum()):
+            return True
+        start = spaced.find(form, start + 1)
+    return False
+
+
+def match_tags(text: str) -> frozenset:
+    """Single pass over the words of the text returning every keyword group it mentions.
+
+    Single words are looked up in a dict; a multi-word phrase ("light sensor") is only
+    searched for when all of its words occur somewhere in the text, and its words must be
+    separated by whitespace alone.
+    """
+    lowered = text.lower()
+    words = lowered.translate(SEPARATORS).split() if lowered.isascii() else WORD.findall(lowered)
+    distinct = set(words)
+
+    phrases = {_WORD_FORMS[word] for word in distinct.intersection(_WORD_FORMS)}
+    spaced = None
+    for phrase, leading, forms in _PHRASE_FORMS:
+        if phrase in phrases or not leading <= distinct:
+            continue
+        for form, last_word in forms:
+            if last_word in distinct:
+                if spaced is None:
+                    spaced = lowered if _single_spaced(lowered) else ' '.join(lowered.split())
+                if _contains_phrase(spaced, form):
+                    phrases.add(phrase)
+                    break
+
+    tags = set()
+    for phrase in phrases:
+        tags |= _PHRASE_TAGS[phrase]
+    return frozenset(tags)
+
+
+@lru_cache(maxsize=1024)
+def extract_features(text: str) -> FeatureSet:
+    """Return the FeatureSet for a prompt; repeated calls for the same prompt are free."""
+    tags = match_tags(text)
+
+    has_devices_control = 'device_control' in tags
+    devices = tuple(device for device in DEVICE_KEYWORDS
+                    if has_devices_control and f'device:{device}' in tags)
+    context_devices = tuple(device for device in CONTEXT_DEVICE_KEYWORDS if f'context:{device}' in tags)
+
+    return FeatureSet(
+        devices=devices,
+        context_devices=context_devices,
+        has_buttons=bool(devices) or ('button' in tags and 'button_exclude' not in tags),
+        has_brightness='brightness' in tags and 'brightness_exclude' not in tags,
+        has_speed='speed' in tags,
+        has_rgb='rgb' in tags and 'rgb_exclude' not in tags,
+        has_temperature='temperature' in tags,
+        has_humidity='humidity' in tags,
+        has_light='light_sensor' in tags,
+        has_distance='distance' in tags,
+        has_motion='motion' in tags,
+        has_moisture='moisture' in tags,
+        has_joystick='joystick' in tags,
+        has_servo='servo' in tags and 'servo_exclude' not in tags,
+        has_general_sensor='general_sensor' in tags,
+        mentions_neopixel='neopixel_name' in tags,
+    )
+
+
+def guess_device(*feature_sets: FeatureSet) -> str:
+    """Highest-priority context device mentioned by any of the feature sets."""
+    mentioned = set()
+    for features in feature_sets:
+        mentioned.update(features.context_devices)
+    for device in CONTEXT_DEVICE_KEYWORDS:
+        if device in mentioned:
+            return device
+    return 'device'
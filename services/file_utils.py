@@ -0,0 +1,19 @@
+import os
+
+
+def write_if_changed(path: str, content: str) -> bool:
+    """Write content only when it differs from the file on disk; return whether it was written.
+
+    Leaving unchanged files untouched keeps their mtimes, so Gradle and the Dart
+    frontend treat them as up to date on incremental builds.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            if f.read() == content:
+                return False
+    except (FileNotFoundError, UnicodeDecodeError):
+        pass
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(content)
+    return True
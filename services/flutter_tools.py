@@ -0,0 +1,144 @@
+import os
+import re
+import json
+import hashlib
+import shutil
+import subprocess
+import threading
+from config import BuildConfig
+from services.process_runner import process_runner
+
+_version_lock = threading.Lock()
+_cached_version = None
+
+# Written into .dart_tool after a successful pub get; `flutter clean` removes it with the rest
+PUB_FINGERPRINT_FILE = os.path.join('.dart_tool', 'pub_fingerprint')
+
+# The root package's own name does not affect resolution; a renamed project keeps its fingerprint
+PUBSPEC_NAME = re.compile(rb'^name:[^\n]*$', re.MULTILINE)
+
+
+def flutter_executable() -> str:
+    """Resolve the flutter executable, preferring the configured SDK over PATH."""
+    sdk_bin = os.path.join(BuildConfig.FLUTTER_SDK_PATH, 'bin')
+    for candidate in ('flutter', 'flutter.bat'):
+        path = os.path.join(sdk_bin, candidate)
+        if os.path.isfile(path):
+            return path
+    return shutil.which('flutter') or 'flutter'
+
+
+def run_flutter(args: list, cwd: str = None, timeout: int = 120, on_line=None, env: dict = None) -> subprocess.CompletedProcess:
+    """Run a flutter subcommand without a shell; stdout holds the tail of the merged output."""
+    command = [flutter_executable()] + list(args)
+    return process_runner.run(command, cwd=cwd, timeout=timeout, span=command_name(args), on_line=on_line, env=env)
+
+
+def command_name(args: list) -> str:
+    """Span name for a flutter invocation: its subcommand words without flags or paths ("flutter pub get")."""
+    words = []
+    for arg in args:
+        if arg.startswith('-') or len(words) == 2:
+            break
+        words.append(arg)
+    return ' '.join(['flutter'] + (words or [str(args[0]).lstrip('-')] if args else []))
+
+
+def flutter_version() -> str:
+    """Return the Flutter framework version, queried once per process."""
+    global _cached_version
+    with _version_lock:
+        if _cached_version is None:
+            try:
+                result = run_flutter(['--version', '--machine'], timeout=60)
+                # Output is merged with stderr, so decode just the JSON object and ignore any trailing warnings
+                info, _ = json.JSONDecoder().raw_decode(result.stdout[result.stdout.find('{'):])
+                _cached_version = f"{info.get('frameworkVersion', 'unknown')}+{info.get('frameworkRevision', '')[:10]}"
+            except Exception as e:
+                print(f"⚠️ Could not determine Flutter version: {e}")
+                _cached_version = 'unknown'
+        return _cached_version
+
+
+def pub_fingerprint(project_path: str) -> str:
+    """Hash of everything pub resolution depends on: pubspec.yaml (minus the package name), pubspec.lock and the SDK."""
+    digest = hashlib.sha256(flutter_version().encode('utf-8'))
+    for name in ('pubspec.yaml', 'pubspec.lock'):
+        digest.update(b'\0' + name.encode('utf-8') + b'\0')
+        try:
+            with open(os.path.join(project_path, name), 'rb') as f:
+                content = f.read()
+        except FileNotFoundError:
+            continue
+        digest.update(PUBSPEC_NAME.sub(b'', content) if name == 'pubspec.yaml' else content)
+    return digest.hexdigest()
+
+
+def _rename_root_package(project_path: str) -> bool:
+    """Give the root package in .dart_tool the pubspec's current name; False when that cannot be done."""
+    try:
+        with open(os.path.join(project_path, 'pubspec.yaml'), 'rb') as f:
+            match = re.search(rb'^name:\s*["\']?([A-Za-z0-9_]+)', f.read(), re.MULTILINE)
+        config_path = os.path.join(project_path, '.dart_tool', 'package_config.json')
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        return False
+    root = next((package for package in config.get('packages', []) if package.get('rootUri') == '../'), None)
+    if match is None or root is None:
+        return False
+    name, old_name = match.group(1).decode('ascii'), root['name']
+    if name == old_name:
+        return True
+
+    root['name'] = name
+    with open(config_path, 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=2)
+    graph_path = os.path.join(project_path, '.dart_tool', 'package_graph.json')
+    if os.path.isfile(graph_path):
+        try:
+            with open(graph_path, 'r', encoding='utf-8') as f:
+                graph = json.load(f)
+        except ValueError:
+            return False
+        graph['roots'] = [name if root_name == old_name else root_name for root_name in graph.get('roots', [])]
+        for package in graph.get('packages', []):
+            if package.get('name') == old_name:
+                package['name'] = name
+        with open(graph_path, 'w', encoding='utf-8') as f:
+            json.dump(graph, f, indent=2)
+    print(f"⚡ Renamed root package {old_name} -> {name} without re-resolving")
+    return True
+
+
+def ensure_dependencies(project_path: str, timeout: int = 120) -> bool:
+    """Run pub get unless nothing it depends on changed since the last successful run.
+
+    Returns whether a resolution actually ran. The shared pub cache is tried offline
+    first, so only genuinely new packages go to the network.
+    """
+    marker = os.path.join(project_path, PUB_FINGERPRINT_FILE)
+    package_config = os.path.join(project_path, '.dart_tool', 'package_config.json')
+    try:
+        with open(marker, 'r', encoding='utf-8') as f:
+            resolved = f.read().strip()
+    except FileNotFoundError:
+        resolved = None
+    if resolved == pub_fingerprint(project_path) and os.path.isfile(package_config) \
+            and _rename_root_package(project_path):
+        print("⚡ Dependencies unchanged since last pub get, skipping resolution")
+        return False
+
+    result = run_flutter(['pub', 'get', '--offline'], cwd=project_path, timeout=timeout)
+    if result.returncode != 0:
+        print("📦 Offline pub get could not resolve, fetching packages...")
+        result = run_flutter(['pub', 'get'], cwd=project_path, timeout=timeout)
+    if result.returncode != 0:
+        raise Exception(f"Flutter pub get failed:\n{result.stdout}")
+
+    # Resolution may have written pubspec.lock, so fingerprint the result rather than the input
+    os.makedirs(os.path.dirname(marker), exist_ok=True)
+    with open(marker, 'w', encoding='utf-8') as f:
+        f.write(pub_fingerprint(project_path))
+    print("✅ Dependencies resolved")
+    return True
@@ -2,16 +2,21 @@ import os
 from langchain_groq import ChatGroq
 from langchain_core.messages import HumanMessage, SystemMessage
 from dotenv import load_dotenv
+from services.llm_cache import llm_cache
+from services.metrics import metrics
 
 load_dotenv()
 
 class GroqClient:
     def __init__(self, model_name="llama-3.1-8b-instant"):
+        self.model_name = model_name
+        self.temperature = 0.1
+        self.max_tokens = 4000
         self.client = ChatGroq(
             api_key=os.getenv("GROQ_API_KEY"),
             model=model_name,
-            temperature=0.1,
-            max_tokens=4000
+            temperature=self.temperature,
+            max_tokens=self.max_tokens
         )
 
     def chat_completion(self, system_prompt: str, user_prompt: str) -> str:
@@ -20,8 +25,12 @@ class GroqClient:
             HumanMessage(content=user_prompt)
         ]
 
-        response = self.client.invoke(messages)
-        return response.content
+        cache_key = llm_cache.make_key('groq', self.model_name, self.temperature, self.max_tokens, system_prompt, user_prompt)
+        return llm_cache.cached_call(cache_key, lambda: self._invoke(messages))
+
+    def _invoke(self, messages: list) -> str:
+        with metrics.span(f'groq {self.model_name}', 'llm'):
+            return self.client.invoke(messages).content
 
     def analyze_prompt(self, user_prompt: str) -> str:
         system_prompt = """
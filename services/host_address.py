@@ -0,0 +1,88 @@
+import socket
+import struct
+import ipaddress
+import threading
+from config import HostConfig
+
+# ioctl returning an interface's IPv4 address (Linux)
+SIOCGIFADDR = 0x8915
+
+
+def interface_addresses() -> list:
+    """(interface name, IPv4 address) pairs for this host, found without touching the network."""
+    pairs = []
+    try:
+        import fcntl
+        probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            for _, name in socket.if_nameindex():
+                try:
+                    packed = fcntl.ioctl(probe.fileno(), SIOCGIFADDR, struct.pack('256s', name[:15].encode()))
+                    pairs.append((name, socket.inet_ntoa(packed[20:24])))
+                except OSError:
+                    # Interface without an IPv4 address
+                    continue
+        finally:
+            probe.close()
+    except (ImportError, AttributeError, OSError):
+        pass
+    if not pairs:
+        # Windows and other platforms: whatever the host name resolves to locally
+        try:
+            for info in socket.getaddrinfo(socket.gethostname(), None, socket.AF_INET):
+                pairs.append(('', info[4][0]))
+        except socket.gaierror:
+            pass
+    return pairs
+
+
+class HostAddress:
+    """The base URL phones use to reach this server, worked out once and cached.
+
+    PUBLIC_BASE_URL wins outright. Otherwise ADVERTISE_INTERFACE picks an interface by
+    name ("eth0"), address or network ("192.168.1.0/24"); by default the first private
+    LAN address is advertised, then any non-loopback one, then localhost.
+    """
+
+    def __init__(self):
+        self._base_url = None
+        self._lock = threading.Lock()
+
+    def base_url(self) -> str:
+        with self._lock:
+            if self._base_url is None:
+                self._base_url = self._detect()
+                print(f"📡 Advertising downloads at {self._base_url}")
+            return self._base_url
+
+    def _detect(self) -> str:
+        if HostConfig.PUBLIC_BASE_URL:
+            return HostConfig.PUBLIC_BASE_URL.rstrip('/')
+        return f"http://{self._pick_address(interface_addresses())}:{HostConfig.SERVER_PORT}"
+
+    def _pick_address(self, pairs: list) -> str:
+        wanted = HostConfig.ADVERTISE_INTERFACE
+        if wanted:
+            for name, address in pairs:
+                if self._matches(wanted, name, address):
+                    return address
+            print(f"⚠️ No IPv4 address on ADVERTISE_INTERFACE={wanted}, falling back to auto-detection")
+
+        candidates = [ipaddress.ip_address(address) for _, address in pairs]
+        for predicate in (lambda ip: ip.is_private and not ip.is_loopback and not ip.is_link_local,
+                          lambda ip: not ip.is_loopback):
+            for ip in candidates:
+                if predicate(ip):
+                    return str(ip)
+        return '127.0.0.1'
+
+    def _matches(self, wanted: str, name: str, address: str) -> bool:
+        if wanted in (name, address):
+            return True
+        try:
+            return ipaddress.ip_address(address) in ipaddress.ip_network(wanted, strict=False)
+        except ValueError:
+            return False
+
+
+host_address = HostAddress()
@@ -0,0 +1,78 @@
+import time
+import math
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from config import JobConfig
+
+
+class QueueFullError(Exception):
+    """Raised when the scheduler cannot accept another job right now."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Job queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class JobScheduler:
+    """Runs generation jobs off the request thread with per-stage concurrency limits."""
+
+    def __init__(self, workers: int = None, queue_limit: int = None,
+                 llm_concurrency: int = None, build_concurrency: int = None):
+        self.workers = workers or JobConfig.JOB_WORKERS
+        self.queue_limit = queue_limit or JobConfig.JOB_QUEUE_LIMIT
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='generation-job')
+        self._slots = {
+            'llm': threading.BoundedSemaphore(llm_concurrency or JobConfig.LLM_STAGE_CONCURRENCY),
+            'build': threading.BoundedSemaphore(build_concurrency or JobConfig.BUILD_STAGE_CONCURRENCY),
+        }
+        self._lock = threading.Lock()
+        self._active = set()
+        self._average_duration = None
+
+    def submit(self, job_id: str, fn, *args, **kwargs):
+        """Queue a job and return immediately; raises QueueFullError when saturated."""
+        with self._lock:
+            if job_id in self._active:
+                return False
+            if len(self._active) >= self.queue_limit:
+                raise QueueFullError(self.retry_after())
+            self._active.add(job_id)
+
+        self._executor.submit(self._run, job_id, fn, *args, **kwargs)
+        return True
+
+    def limit(self, resource: str, fn):
+        """Wrap a workflow node so it only runs while holding a slot of the given resource class."""
+        slots = self._slots[resource]
+
+        @functools.wraps(fn)
+        def limited(state):
+            with slots:
+                return fn(state)
+
+        return limited
+
+    def retry_after(self) -> int:
+        if self._average_duration is None:
+            return JobConfig.JOB_RETRY_AFTER
+        # With every worker busy, a job finishes roughly every average_duration / workers seconds
+        return max(1, math.ceil(self._average_duration / self.workers))
+
+    def _run(self, job_id: str, fn, *args, **kwargs):
+        started = time.monotonic()
+        try:
+            fn(*args, **kwargs)
+        except Exception as e:
+            print(f"💥 Job {job_id} crashed: {e}")
+        finally:
+            duration = time.monotonic() - started
+            with self._lock:
+                self._active.discard(job_id)
+                if self._average_duration is None:
+                    self._average_duration = duration
+                else:
+                    self._average_duration = 0.8 * self._average_duration + 0.2 * duration
+
+
+job_scheduler = JobScheduler()
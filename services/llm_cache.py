@@ -0,0 +1,98 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from config import CacheConfig
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so cosmetic differences do not defeat the cache."""
+    return re.sub(r'\s+', ' ', prompt).strip()
+
+
+class LLMResponseCache:
+    """Disk-backed LRU + TTL cache of model responses shared by all LLM clients."""
+
+    def __init__(self, db_path: str = None, max_entries: int = None, ttl_seconds: int = None):
+        self.db_path = db_path or CacheConfig.LLM_CACHE_PATH
+        self.max_entries = max_entries or CacheConfig.LLM_CACHE_MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds or CacheConfig.LLM_CACHE_TTL_SECONDS
+        self.enabled = CacheConfig.LLM_CACHE_ENABLED
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def make_key(self, provider: str, model: str, temperature: float, max_tokens: int,
+                 system_prompt: str, user_prompt: str) -> str:
+        payload = json.dumps([
+            provider, model, temperature, max_tokens,
+            hashlib.sha256(system_prompt.encode('utf-8')).hexdigest(),
+            normalize_prompt(user_prompt),
+        ])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str):
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute('SELECT response, created_at FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self.misses += 1
+                return None
+            conn.execute('UPDATE responses SET last_access = ? WHERE key = ?', (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str):
+        if not self.enabled:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute('INSERT OR REPLACE INTO responses (key, response, created_at, last_access) VALUES (?, ?, ?, ?)',
+                         (key, response, now, now))
+            self._evict(conn, now)
+
+    def cached_call(self, key: str, call):
+        """Return the cached response for key, or run call() and remember its result."""
+        response = self.get(key)
+        if response is not None:
+            print(f"⚡ LLM cache hit ({self.hits} hits / {self.misses} misses)")
+            return response
+        response = call()
+        if response:
+            self.put(key, response)
+        return response
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': (self.hits / total) if total else 0.0}
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        conn.execute('DELETE FROM responses WHERE created_at < ?', (now - self.ttl_seconds,))
+        count = conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        if count > self.max_entries:
+            conn.execute('DELETE FROM responses WHERE key IN '
+                         '(SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)', (count - self.max_entries,))
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS responses ('
+                               'key TEXT PRIMARY KEY, response TEXT NOT NULL, '
+                               'created_at REAL NOT NULL, last_access REAL NOT NULL)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)')
+        return self._conn
+
+
+llm_cache = LLMResponseCache()
@@ -0,0 +1,141 @@
+import time
+import threading
+import contextvars
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from functools import wraps
+from config import MetricsConfig
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Session the current thread is working for; LangGraph copies it into node threads
+current_session = contextvars.ContextVar('current_session', default=None)
+
+
+class SpanStats:
+    """Running count/sum plus a bounded window of recent durations for percentiles."""
+
+    def __init__(self, window: int):
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+        self.max = 0.0
+        self.samples = deque(maxlen=window)
+
+    def add(self, duration: float, ok: bool):
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.samples.append(duration)
+        if not ok:
+            self.errors += 1
+
+    def quantiles(self) -> dict:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {q: 0.0 for q in QUANTILES}
+        # Nearest-rank percentile over the window
+        return {q: ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))] for q in QUANTILES}
+
+
+class MetricsRegistry:
+    """Timing spans for pipeline stages, external commands and LLM calls, aggregated and per session."""
+
+    def __init__(self, window: int = None, session_limit: int = None):
+        self.window = window or MetricsConfig.METRICS_SAMPLE_WINDOW
+        self.session_limit = session_limit or MetricsConfig.METRICS_SESSION_LIMIT
+        self._stats = {}
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def session(self, session_id: str):
+        """Attribute spans opened in this context (and in LangGraph nodes it runs) to a session."""
+        token = current_session.set(session_id)
+        try:
+            yield
+        finally:
+            current_session.reset(token)
+
+    @contextmanager
+    def span(self, name: str, kind: str = 'stage', session_id: str = None):
+        """Time the block; it counts as an error if it raises or sets outcome['ok'] = False."""
+        started_at = time.time()
+        start = time.perf_counter()
+        outcome = {'ok': True}
+        try:
+            yield outcome
+        except BaseException:
+            outcome['ok'] = False
+            raise
+        finally:
+            self.record(name, kind, time.perf_counter() - start, session_id or current_session.get(),
+                        outcome['ok'], started_at)
+
+    def timed(self, name: str, kind: str = 'stage'):
+        """Decorator form of span()."""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name, kind):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record(self, name: str, kind: str, duration: float, session_id: str = None, ok: bool = True,
+               started_at: float = None):
+        with self._lock:
+            stats = self._stats.get((kind, name))
+            if stats is None:
+                stats = self._stats[(kind, name)] = SpanStats(self.window)
+            stats.add(duration, ok)
+            if session_id:
+                spans = self._sessions.pop(session_id, None) or []
+                spans.append({'name': name, 'kind': kind, 'started_at': started_at or time.time() - duration,
+                              'duration': round(duration, 6), 'ok': ok})
+                self._sessions[session_id] = spans
+                while len(self._sessions) > self.session_limit:
+                    self._sessions.popitem(last=False)
+
+    def session_spans(self, session_id: str):
+        with self._lock:
+            spans = self._sessions.get(session_id)
+            return list(spans) if spans is not None else None
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            items = [(kind, name, stats.count, stats.total, stats.errors, stats.max, stats.quantiles())
+                     for (kind, name), stats in sorted(self._stats.items())]
+        spans = {}
+        for kind, name, count, total, errors, longest, quantiles in items:
+            spans[f'{kind}:{name}'] = {
+                'kind': kind, 'name': name, 'count': count, 'errors': errors,
+                'sum': round(total, 6), 'max': round(longest, 6),
+                **{f'p{int(q * 100)}': round(value, 6) for q, value in quantiles.items()},
+            }
+        return {'spans': spans}
+
+    def prometheus(self) -> str:
+        lines = [
+            '# HELP flutter_generator_span_seconds Duration of pipeline stages, external commands and LLM calls.',
+            '# TYPE flutter_generator_span_seconds summary',
+        ]
+        errors = [
+            '# HELP flutter_generator_span_errors_total Spans that ended with an exception.',
+            '# TYPE flutter_generator_span_errors_total counter',
+        ]
+        for span in self.snapshot()['spans'].values():
+            labels = f'kind="{_escape(span["kind"])}",name="{_escape(span["name"])}"'
+            for q in QUANTILES:
+                lines.append(f'flutter_generator_span_seconds{{{labels},quantile="{q}"}} {span[f"p{int(q * 100)}"]}')
+            lines.append(f'flutter_generator_span_seconds_sum{{{labels}}} {span["sum"]}')
+            lines.append(f'flutter_generator_span_seconds_count{{{labels}}} {span["count"]}')
+            errors.append(f'flutter_generator_span_errors_total{{{labels}}} {span["errors"]}')
+        return '\n'.join(lines + errors) + '\n'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,174 @@
+import os
+import re
+import math
+import signal
+import subprocess
+import threading
+from collections import OrderedDict, deque
+from config import BuildConfig
+from services.metrics import metrics, current_session
+
+# Gradle's rich console status line, e.g. "<=========----> 72% EXECUTING [41s]"
+GRADLE_PERCENT = re.compile(r'(\d{1,3})% (?:EXECUTING|CONFIGURING)')
+GRADLE_TASK = re.compile(r'> Task :')
+# A release build of a generated app runs a couple of hundred tasks; counted tasks approach this asymptotically
+GRADLE_TASK_SCALE = 120.0
+
+# Flutter milestones and the share of the build done once they appear
+FLUTTER_MILESTONES = (
+    (re.compile(r'Resolving dependencies'), 0.02),
+    (re.compile(r'Got dependencies'), 0.05),
+    (re.compile(r"Running Gradle task '"), 0.10),
+    (re.compile(r'Font asset .* was tree-shaken'), 0.90),
+    (re.compile(r'✓ Built '), 1.0),
+)
+
+
+class BuildProgressParser:
+    """Turns flutter/Gradle output lines into a build completion fraction that never goes backwards."""
+
+    def __init__(self):
+        self.fraction = 0.0
+        self.tasks = 0
+
+    def feed(self, line: str) -> bool:
+        """Consume one line; returns whether the fraction moved."""
+        candidate = self.fraction
+        for pattern, value in FLUTTER_MILESTONES:
+            if pattern.search(line):
+                candidate = max(candidate, value)
+        percent = GRADLE_PERCENT.search(line)
+        if percent:
+            candidate = max(candidate, 0.10 + 0.85 * min(int(percent.group(1)), 100) / 100)
+        elif GRADLE_TASK.search(line):
+            self.tasks += 1
+            candidate = max(candidate, 0.10 + 0.80 * (1 - math.exp(-self.tasks / GRADLE_TASK_SCALE)))
+        if candidate > self.fraction:
+            self.fraction = candidate
+            return True
+        return False
+
+
+class ProcessRunner:
+    """Runs external commands without a shell, streaming output into bounded per-session buffers.
+
+    stdout and stderr are merged and read line by line, so a chatty Gradle build costs at most
+    PROCESS_LOG_LINES lines of memory. A timeout or cancel() kills the whole process tree.
+    """
+
+    def __init__(self, max_lines: int = None, line_chars: int = None, session_limit: int = 200):
+        self.max_lines = max_lines or BuildConfig.PROCESS_LOG_LINES
+        self.line_chars = line_chars or BuildConfig.PROCESS_LOG_LINE_CHARS
+        self.session_limit = session_limit
+        self._buffers = OrderedDict()
+        self._running = {}
+        self._lock = threading.Lock()
+
+    def run(self, command: list, cwd: str = None, timeout: float = None, span: str = None,
+            session_id: str = None, on_line=None, env: dict = None) -> subprocess.CompletedProcess:
+        """Run command to completion; returns a CompletedProcess whose stdout is the output tail.
+
+        on_line is called with every (truncated) line as it arrives. Raises
+        subprocess.TimeoutExpired after killing the process tree when timeout elapses.
+        """
+        session_id = session_id or current_session.get() or 'unknown'
+        tail = deque(maxlen=self.max_lines)
+        buffer = self._buffer(session_id)
+
+        with metrics.span(span or os.path.basename(str(command[0])), 'command') as outcome:
+            process = subprocess.Popen(command, cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                       stdin=subprocess.DEVNULL, text=True, encoding='utf-8', errors='replace',
+                                       bufsize=1, **self._group_options())
+            self._track(session_id, process)
+            reader = threading.Thread(target=self._pump, args=(process, tail, buffer, on_line),
+                                      name=f'process-output-{process.pid}', daemon=True)
+            reader.start()
+            try:
+                returncode = process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                self._kill_tree(process)
+                process.wait()
+                reader.join(timeout=5)
+                outcome['ok'] = False
+                raise subprocess.TimeoutExpired(command, timeout, output='\n'.join(tail))
+            finally:
+                self._untrack(session_id, process)
+            reader.join(timeout=5)
+            outcome['ok'] = returncode == 0
+        return subprocess.CompletedProcess(command, returncode, stdout='\n'.join(tail), stderr='')
+
+    def tail(self, session_id: str, lines: int = None) -> list:
+        """The most recent output lines recorded for a session, oldest first."""
+        with self._lock:
+            buffer = list(self._buffers.get(session_id, ()))
+        return buffer[-lines:] if lines else buffer
+
+    def clear(self, session_id: str):
+        """Forget a session's recorded output, e.g. before it is regenerated."""
+        with self._lock:
+            self._buffers.pop(session_id, None)
+
+    def cancel(self, session_id: str) -> int:
+        """Kill every process still running for the session; returns how many were killed."""
+        with self._lock:
+            processes = list(self._running.pop(session_id, ()))
+        for process in processes:
+            if process.poll() is None:
+                print(f"🛑 Killing process tree {process.pid} for session {session_id}")
+                self._kill_tree(process)
+        return len(processes)
+
+    def _pump(self, process, tail: deque, buffer: deque, on_line):
+        for raw in process.stdout:
+            line = raw.rstrip('\r\n')
+            if len(line) > self.line_chars:
+                line = line[:self.line_chars] + '…'
+            tail.append(line)
+            buffer.append(line)
+            if on_line:
+                try:
+                    on_line(line)
+                except Exception as e:
+                    print(f"⚠️ Output callback failed: {e}")
+        process.stdout.close()
+
+    def _buffer(self, session_id: str) -> deque:
+        with self._lock:
+            buffer = self._buffers.get(session_id)
+            if buffer is None:
+                buffer = self._buffers[session_id] = deque(maxlen=self.max_lines)
+                while len(self._buffers) > self.session_limit:
+                    self._buffers.popitem(last=False)
+            else:
+                self._buffers.move_to_end(session_id)
+            return buffer
+
+    def _track(self, session_id: str, process):
+        with self._lock:
+            self._running.setdefault(session_id, set()).add(process)
+
+    def _untrack(self, session_id: str, process):
+        with self._lock:
+            running = self._running.get(session_id)
+            if running:
+                running.discard(process)
+                if not running:
+                    del self._running[session_id]
+
+    def _group_options(self) -> dict:
+        # Own process group, so the Gradle daemon client and Dart children die with flutter
+        if os.name == 'nt':
+            return {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+        return {'start_new_session': True}
+
+    def _kill_tree(self, process):
+        try:
+            if os.name == 'nt':
+                subprocess.run(['taskkill', '/F', '/T', '/PID', str(process.pid)], capture_output=True)
+            else:
+                os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError, OSError):
+            process.kill()
+
+
+process_runner = ProcessRunner()
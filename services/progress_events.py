@@ -0,0 +1,88 @@
+import time
+import threading
+from collections import deque
+
+# How long a finished session's events stay available for late or reconnecting listeners
+CLOSED_CHANNEL_TTL = 600
+
+
+class _Channel:
+    def __init__(self, max_events: int):
+        self.events = deque(maxlen=max_events)
+        self.next_id = 1
+        self.closed_at = None
+
+
+class ProgressBroker:
+    """In-process fan-out of per-session progress events for Server-Sent Events clients."""
+
+    def __init__(self, max_events: int = 500):
+        self.max_events = max_events
+        self._channels = {}
+        self._condition = threading.Condition()
+
+    def publish(self, session_id: str, event: str, data: dict):
+        with self._condition:
+            channel = self._channel(session_id)
+            channel.events.append((channel.next_id, event, data))
+            channel.next_id += 1
+            self._condition.notify_all()
+
+    def close(self, session_id: str):
+        """Mark the session finished; listeners drain remaining events and stop."""
+        with self._condition:
+            self._channel(session_id).closed_at = time.monotonic()
+            self._condition.notify_all()
+            self._expire_closed()
+
+    def reopen(self, session_id: str):
+        """Accept events again for a finished session that is being regenerated.
+
+        The previous run's events, its `done` included, are dropped so a new listener
+        does not replay them; ids keep increasing for listeners still connected.
+        """
+        with self._condition:
+            channel = self._channel(session_id)
+            channel.events.clear()
+            channel.closed_at = None
+
+    def listen(self, session_id: str, last_event_id: int = 0, heartbeat: float = 15.0):
+        """Yield (id, event, data) tuples after last_event_id; yields None as a keep-alive tick.
+
+        Listening never creates a channel: for a session without one here (not started yet,
+        expired, or running in another worker) only keep-alive ticks are yielded, and the
+        caller falls back to the shared session store.
+        """
+        while True:
+            with self._condition:
+                channel = self._channels.get(session_id)
+                pending = [item for item in channel.events if item[0] > last_event_id] if channel else []
+                if not pending:
+                    if channel is not None and channel.closed_at is not None:
+                        return
+                    self._condition.wait(timeout=heartbeat)
+                    channel = self._channels.get(session_id)
+                    pending = [item for item in channel.events if item[0] > last_event_id] if channel else []
+
+            if not pending:
+                yield None
+                continue
+            for item in pending:
+                last_event_id = item[0]
+                yield item
+
+    def _channel(self, session_id: str) -> _Channel:
+        channel = self._channels.get(session_id)
+        if channel is None:
+            channel = self._channels[session_id] = _Channel(self.max_events)
+        return channel
+
+    def _expire_closed(self):
+        now = time.monotonic()
+        expired = [sid for sid, channel in self._channels.items()
+                   if channel.closed_at is not None and now - channel.closed_at > CLOSED_CHANNEL_TTL]
+        for sid in expired:
+            del self._channels[sid]
+
+
+progress_broker = ProgressBroker()
@@ -0,0 +1,71 @@
+import re
+import threading
+from collections import Counter
+
+
+class Rule:
+    """One rewrite: a regex and its replacement.
+
+    The replacement is a \\1-style template or a function of (matched text, original code).
+    `when` is evaluated once against the original code; a rule whose condition is false
+    stays in the combined pattern but leaves its matches untouched. `count` caps the
+    replacements per document.
+    """
+
+    def __init__(self, name: str, pattern: str, replacement, when=None, count: int = None):
+        self.name = name
+        self.pattern = pattern
+        self.replacement = replacement
+        self.when = when
+        self.count = count
+        self.regex = re.compile(pattern)
+
+
+class RewriteEngine:
+    """Applies an ordered rule set in a single left-to-right scan and counts hits per rule.
+
+    Rules are tried in list order at each position, so put specific rules before the
+    general ones they overlap with.
+    """
+
+    def __init__(self, name: str, rules: list, required_imports: tuple = ()):
+        self.name = name
+        self.rules = {f'r{index}': rule for index, rule in enumerate(rules)}
+        self.required_imports = required_imports
+        self.pattern = re.compile('|'.join(f'(?P<{key}>{rule.pattern})' for key, rule in self.rules.items()))
+        self.hits = Counter()
+        self._lock = threading.Lock()
+
+    def apply(self, code: str):
+        """Rewrite code; returns (rewritten code, hit counts for this document)."""
+        enabled = {key for key, rule in self.rules.items() if rule.when is None or rule.when(code)}
+        hits = Counter()
+
+        def replace(match):
+            key = match.lastgroup
+            matched = match.group(key)
+            if key not in enabled:
+                return matched
+            rule = self.rules[key]
+            if rule.count is not None and hits[rule.name] >= rule.count:
+                return matched
+            hits[rule.name] += 1
+            if callable(rule.replacement):
+                return rule.replacement(matched, code)
+            return rule.regex.fullmatch(matched).expand(rule.replacement)
+
+        rewritten = self.pattern.sub(replace, code)
+
+        # Imports are prepended in one step; the last missing import ends up first, as before
+        missing = [stmt for stmt in self.required_imports if stmt not in rewritten]
+        if missing:
+            hits['missing_imports'] += len(missing)
+            rewritten = ''.join(stmt + '\n' for stmt in reversed(missing)) + rewritten
+
+        with self._lock:
+            self.hits.update(hits)
+        return rewritten, hits
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.hits)
@@ -0,0 +1,226 @@
+import os
+import copy
+import json
+import time
+import sqlite3
+import threading
+from config import SessionConfig
+
+# Bulky fields kept outside the main session row so progress reads stay cheap
+OUT_OF_LINE_FIELDS = ('generated_files',)
+
+# Run TTL eviction at most this often
+EVICTION_INTERVAL = 600
+
+
+class MemorySessionStore:
+    """Per-process session store; sessions are lost on restart."""
+
+    def __init__(self, ttl_seconds: int = None):
+        self.ttl_seconds = ttl_seconds or SessionConfig.SESSION_TTL_SECONDS
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._last_eviction = time.time()
+
+    def create(self, session_id: str, state: dict):
+        with self._lock:
+            # [updated_at, state]; TTL counts from the last write
+            self._sessions[session_id] = [time.time(), copy.deepcopy(dict(state))]
+        self._maybe_evict()
+
+    def get(self, session_id: str, include_blobs: bool = True):
+        """The session state; include_blobs=False skips the generated files, e.g. for progress polls."""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if not entry:
+                return None
+            if include_blobs:
+                return copy.deepcopy(entry[1])
+            return copy.deepcopy({k: v for k, v in entry[1].items() if k not in OUT_OF_LINE_FIELDS})
+
+    def exists(self, session_id: str) -> bool:
+        with self._lock:
+            return session_id in self._sessions
+
+    def update(self, session_id: str, changes: dict):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry:
+                entry[1].update(copy.deepcopy(changes))
+                entry[0] = time.time()
+
+    def compare_and_set(self, session_id: str, field: str, expected, value) -> bool:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if not entry or entry[1].get(field) != expected:
+                return False
+            entry[1][field] = value
+            entry[0] = time.time()
+            return True
+
+    def append_error(self, session_id: str, message: str):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry:
+                entry[1].setdefault('error_log', []).append(message)
+                entry[0] = time.time()
+
+    def evict_expired(self) -> int:
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [sid for sid, (updated_at, _) in self._sessions.items() if updated_at < cutoff]
+            for sid in expired:
+                del self._sessions[sid]
+            self._last_eviction = time.time()
+        return len(expired)
+
+    def _maybe_evict(self):
+        if time.time() - self._last_eviction > EVICTION_INTERVAL:
+            self.evict_expired()
+
+
+class SQLiteSessionStore:
+    """Session store in a WAL-mode SQLite database shared by all worker processes."""
+
+    def __init__(self, db_path: str = None, ttl_seconds: int = None):
+        self.db_path = db_path or SessionConfig.SESSION_DB_PATH
+        self.ttl_seconds = ttl_seconds or SessionConfig.SESSION_TTL_SECONDS
+        self._local = threading.local()
+        self._last_eviction = time.time()
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._init_schema()
+
+    def create(self, session_id: str, state: dict):
+        inline, blobs = self._split(state)
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute('INSERT OR REPLACE INTO sessions (session_id, created_at, updated_at, state) VALUES (?, ?, ?, ?)',
+                         (session_id, now, now, json.dumps(inline)))
+            self._write_blobs(conn, session_id, blobs)
+        self._maybe_evict()
+
+    def get(self, session_id: str, include_blobs: bool = True):
+        """The session state; include_blobs=False reads only the main row, e.g. for progress polls."""
+        conn = self._connection()
+        row = conn.execute('SELECT state FROM sessions WHERE session_id = ?', (session_id,)).fetchone()
+        if row is None:
+            return None
+        state = json.loads(row[0])
+        if not include_blobs:
+            return state
+        for field, value in conn.execute('SELECT field, value FROM session_blobs WHERE session_id = ?', (session_id,)):
+            state[field] = json.loads(value)
+        return state
+
+    def exists(self, session_id: str) -> bool:
+        row = self._connection().execute('SELECT 1 FROM sessions WHERE session_id = ?', (session_id,)).fetchone()
+        return row is not None
+
+    def update(self, session_id: str, changes: dict):
+        """Merge the given fields into the stored state in one transaction."""
+        inline, blobs = self._split(changes)
+        with self._transaction() as conn:
+            row = conn.execute('SELECT state FROM sessions WHERE session_id = ?', (session_id,)).fetchone()
+            if row is None:
+                return
+            if inline:
+                state = json.loads(row[0])
+                state.update(inline)
+                conn.execute('UPDATE sessions SET state = ?, updated_at = ? WHERE session_id = ?',
+                             (json.dumps(state), time.time(), session_id))
+            self._write_blobs(conn, session_id, blobs)
+
+    def compare_and_set(self, session_id: str, field: str, expected, value) -> bool:
+        with self._transaction() as conn:
+            row = conn.execute('SELECT state FROM sessions WHERE session_id = ?', (session_id,)).fetchone()
+            if row is None:
+                return False
+            state = json.loads(row[0])
+            if state.get(field) != expected:
+                return False
+            state[field] = value
+            conn.execute('UPDATE sessions SET state = ?, updated_at = ? WHERE session_id = ?',
+                         (json.dumps(state), time.time(), session_id))
+            return True
+
+    def append_error(self, session_id: str, message: str):
+        with self._transaction() as conn:
+            row = conn.execute('SELECT state FROM sessions WHERE session_id = ?', (session_id,)).fetchone()
+            if row is None:
+                return
+            state = json.loads(row[0])
+            state.setdefault('error_log', []).append(message)
+            conn.execute('UPDATE sessions SET state = ?, updated_at = ? WHERE session_id = ?',
+                         (json.dumps(state), time.time(), session_id))
+
+    def evict_expired(self) -> int:
+        """Drop sessions untouched for the TTL; a long-running job keeps its session alive."""
+        cutoff = time.time() - self.ttl_seconds
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM session_blobs WHERE session_id IN '
+                         '(SELECT session_id FROM sessions WHERE updated_at < ?)', (cutoff,))
+            deleted = conn.execute('DELETE FROM sessions WHERE updated_at < ?', (cutoff,)).rowcount
+        self._last_eviction = time.time()
+        if deleted:
+            print(f"🧹 Evicted {deleted} expired sessions")
+        return deleted
+
+    def _maybe_evict(self):
+        if time.time() - self._last_eviction > EVICTION_INTERVAL:
+            self.evict_expired()
+
+    def _split(self, state: dict):
+        inline = {k: v for k, v in state.items() if k not in OUT_OF_LINE_FIELDS}
+        blobs = {k: v for k, v in state.items() if k in OUT_OF_LINE_FIELDS}
+        return inline, blobs
+
+    def _write_blobs(self, conn, session_id: str, blobs: dict):
+        for field, value in blobs.items():
+            conn.execute('INSERT OR REPLACE INTO session_blobs (session_id, field, value) VALUES (?, ?, ?)',
+                         (session_id, field, json.dumps(value)))
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self):
+        return _ImmediateTransaction(self._connection())
+
+    def _init_schema(self):
+        with self._transaction() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS sessions ('
+                         'session_id TEXT PRIMARY KEY, created_at REAL NOT NULL, '
+                         'updated_at REAL NOT NULL, state TEXT NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions (updated_at)')
+            conn.execute('CREATE TABLE IF NOT EXISTS session_blobs ('
+                         'session_id TEXT NOT NULL, field TEXT NOT NULL, value TEXT NOT NULL, '
+                         'PRIMARY KEY (session_id, field))')
+
+
+class _ImmediateTransaction:
+    """BEGIN IMMEDIATE takes the write lock up front so read-modify-write updates cannot interleave."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
+
+
+def create_session_store():
+    if SessionConfig.SESSION_STORE_BACKEND == 'memory':
+        return MemorySessionStore()
+    return SQLiteSessionStore()
+
+
+session_store = create_session_store()
@@ -0,0 +1,188 @@
+import os
+import re
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+from config import BuildConfig
+from services.flutter_tools import run_flutter, flutter_version
+
+# Name used when generating the golden skeleton; rewritten on every clone
+SKELETON_APP_NAME = 'skeleton_app'
+
+# Generated binary assets never change after `flutter create`, so they are safe to share
+SHARED_SUFFIXES = ('.png', '.jpg', '.jpeg', '.webp', '.ico', '.jar', '.ttf', '.otf')
+
+# Per-build state that must not leak from the skeleton into sessions
+EXCLUDED_ENTRIES = {'.dart_tool', 'build', '.idea', '.flutter-plugins', '.flutter-plugins-dependencies'}
+
+
+class SkeletonCache:
+    """Builds one `flutter create` project per toolchain and clones it per session."""
+
+    def __init__(self, cache_dir: str = None):
+        self.cache_dir = cache_dir or BuildConfig.SKELETON_CACHE_DIR
+        self._lock = threading.Lock()
+
+    def cache_key(self, platforms: str, android_language: str) -> str:
+        raw = json.dumps([flutter_version(), platforms, android_language])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+    def ensure_skeleton(self, platforms: str, android_language: str) -> str:
+        """Return the skeleton directory for this key, creating it on first use."""
+        skeleton_dir = os.path.join(self.cache_dir, self.cache_key(platforms, android_language))
+        if os.path.isdir(skeleton_dir):
+            return skeleton_dir
+
+        with self._lock:
+            if os.path.isdir(skeleton_dir):
+                return skeleton_dir
+
+            os.makedirs(self.cache_dir, exist_ok=True)
+            staging_dir = tempfile.mkdtemp(prefix='skeleton_', dir=self.cache_dir)
+            project_path = os.path.join(staging_dir, SKELETON_APP_NAME)
+
+            print(f"🧱 Building golden Flutter skeleton ({platforms}, {android_language})...")
+            result = run_flutter([
+                'create',
+                '--project-name', SKELETON_APP_NAME,
+                '--platforms', platforms,
+                '--android-language', android_language,
+                project_path
+            ], cwd=staging_dir, timeout=300)
+            if result.returncode != 0:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+                raise Exception(f"Flutter create failed: {result.stdout}")
+
+            for entry in EXCLUDED_ENTRIES:
+                target = os.path.join(project_path, entry)
+                if os.path.isdir(target):
+                    shutil.rmtree(target, ignore_errors=True)
+                elif os.path.exists(target):
+                    os.remove(target)
+
+            with open(os.path.join(staging_dir, 'skeleton.json'), 'w', encoding='utf-8') as f:
+                json.dump({'flutter_version': flutter_version(), 'platforms': platforms,
+                           'android_language': android_language}, f)
+
+            try:
+                os.rename(staging_dir, skeleton_dir)
+            except OSError:
+                # Another process published the same skeleton first
+                shutil.rmtree(staging_dir, ignore_errors=True)
+
+            print(f"✅ Golden skeleton cached at {skeleton_dir}")
+            return skeleton_dir
+
+    def clone(self, app_name: str, project_path: str, platforms: str = None, android_language: str = None):
+        """Materialize a session project from the skeleton under a new name."""
+        skeleton_dir = self.ensure_skeleton(platforms or BuildConfig.PROJECT_PLATFORMS,
+                                            android_language or BuildConfig.ANDROID_LANGUAGE)
+        source_root = os.path.join(skeleton_dir, SKELETON_APP_NAME)
+        token = re.compile(r'\b' + SKELETON_APP_NAME + r'\b')
+
+        for root, dirs, files in os.walk(source_root):
+            dirs[:] = [d for d in dirs if d not in EXCLUDED_ENTRIES]
+            rel_dir = os.path.relpath(root, source_root)
+            dest_dir = os.path.join(project_path, token.sub(app_name, rel_dir)) if rel_dir != '.' else project_path
+            os.makedirs(dest_dir, exist_ok=True)
+
+            for name in files:
+                if name in EXCLUDED_ENTRIES:
+                    continue
+                source = os.path.join(root, name)
+                dest = os.path.join(dest_dir, token.sub(app_name, name))
+                if name.lower().endswith(SHARED_SUFFIXES):
+                    self._link_or_copy(source, dest)
+                else:
+                    self._copy_renamed(source, dest, token, app_name)
+
+    def rename(self, project_path: str, old_name: str, new_name: str) -> str:
+        """Rename a project in place and return its new path.
+
+        Only the places `flutter create` derives from the name are touched: the pubspec name,
+        Gradle namespace/applicationId, manifest label and package, the Kotlin/Java package,
+        the widget test's import of main.dart and the .iml files. Other text that happens to contain
+        the old name (e.g. "flutter" in package:flutter/) is left alone.
+        """
+        if old_name == new_name:
+            return project_path
+        old = re.escape(old_name)
+
+        self._sub_file(os.path.join(project_path, 'pubspec.yaml'),
+                       rf'^(name:\s*)["\']?{old}["\']?(\s*)$', new_name, re.MULTILINE)
+        for gradle_file in ('build.gradle', 'build.gradle.kts'):
+            self._sub_file(os.path.join(project_path, 'android', 'app', gradle_file),
+                           rf'\b((?:namespace|applicationId)\s*=?\s*(["\'])(?:\w+\.)*){old}(\2)', new_name)
+
+        src_dir = os.path.join(project_path, 'android', 'app', 'src')
+        source_sets = os.listdir(src_dir) if os.path.isdir(src_dir) else []
+        package_dirs = set()
+        for source_set in source_sets:
+            self._sub_file(os.path.join(src_dir, source_set, 'AndroidManifest.xml'),
+                           rf'((?:android:label|package)="(?:\w+\.)*){old}(")', new_name)
+            for language in ('kotlin', 'java'):
+                for root, _, files in os.walk(os.path.join(src_dir, source_set, language)):
+                    for name in files:
+                        if name.endswith(('.kt', '.java')) and self._sub_file(
+                                os.path.join(root, name), rf'^(package\s+(?:\w+\.)*){old}(\s*;?\s*)$',
+                                new_name, re.MULTILINE) and os.path.basename(root) == old_name:
+                            package_dirs.add(root)
+        for package_dir in package_dirs:
+            os.rename(package_dir, os.path.join(os.path.dirname(package_dir), new_name))
+
+        # The app's own library, not packages that share its name (package:flutter/material.dart)
+        self._sub_file(os.path.join(project_path, 'test', 'widget_test.dart'),
+                       rf"(import\s+'package:){old}(/main\.dart')", new_name)
+
+        for directory, old_file, new_file in ((project_path, f'{old_name}.iml', f'{new_name}.iml'),
+                                              (os.path.join(project_path, 'android'),
+                                               f'{old_name}_android.iml', f'{new_name}_android.iml')):
+            if os.path.isfile(os.path.join(directory, old_file)):
+                os.rename(os.path.join(directory, old_file), os.path.join(directory, new_file))
+
+        new_path = os.path.join(os.path.dirname(project_path), new_name)
+        os.rename(project_path, new_path)
+        return new_path
+
+    def _sub_file(self, path: str, pattern: str, new_name: str, flags: int = 0) -> bool:
+        """Replace the name between the pattern's surrounding groups; returns whether the file changed."""
+        try:
+            with open(path, 'r', encoding='utf-8', newline='') as f:
+                content = f.read()
+        except (OSError, UnicodeDecodeError):
+            return False
+        regex = re.compile(pattern, flags)
+        last = regex.groups
+
+        def replace(match):
+            return match.group(1) + new_name + match.group(last)
+
+        updated = regex.sub(replace, content)
+        if updated == content:
+            return False
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            f.write(updated)
+        return True
+
+    def _link_or_copy(self, source: str, dest: str):
+        try:
+            os.link(source, dest)
+        except OSError:
+            shutil.copy2(source, dest)
+
+    def _copy_renamed(self, source: str, dest: str, token, app_name: str):
+        # Text files are small and are rewritten by later stages, so they get private copies
+        try:
+            with open(source, 'r', encoding='utf-8', newline='') as f:
+                content = f.read()
+        except UnicodeDecodeError:
+            shutil.copy2(source, dest)
+            return
+        with open(dest, 'w', encoding='utf-8', newline='') as f:
+            f.write(token.sub(app_name, content))
+        shutil.copystat(source, dest)
+
+
+skeleton_cache = SkeletonCache()
@@ -0,0 +1,37 @@
+import os
+import re
+from functools import lru_cache
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dart_templates')
+
+# Slots are written as @@name@@, which never occurs in Dart source
+SLOT_PATTERN = re.compile(r'@@(\w+)@@')
+
+
+class Template:
+    """A template split once into literal parts and slot names, rendered with a single join."""
+
+    def __init__(self, name: str, text: str):
+        self.name = name
+        pieces = SLOT_PATTERN.split(text)
+        # Even indexes are literals, odd indexes are slot names
+        self.literals = pieces[0::2]
+        self.slots = pieces[1::2]
+
+    def render(self, **values) -> str:
+        parts = [self.literals[0]]
+        for slot, literal in zip(self.slots, self.literals[1:]):
+            try:
+                parts.append(values[slot])
+            except KeyError:
+                raise KeyError(f"Template '{self.name}' needs a value for slot '{slot}'")
+            parts.append(literal)
+        return ''.join(parts)
+
+
+@lru_cache(maxsize=None)
+def load_template(name: str) -> Template:
+    """Read and compile dart_templates/<name>.dart.tmpl once per process."""
+    path = os.path.join(TEMPLATE_DIR, f'{name}.dart.tmpl')
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return Template(name, f.read())
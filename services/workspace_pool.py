@@ -0,0 +1,190 @@
+import os
+import queue
+import shutil
+import filecmp
+import threading
+from config import BuildConfig
+from services.flutter_tools import run_flutter, ensure_dependencies
+from services.skeleton_cache import skeleton_cache
+from services.build_executor import build_executor, gradle_env
+
+# Files a session owns inside a workspace; everything else (.dart_tool, build/, Gradle caches) stays warm
+SESSION_OWNED_PATHS = [
+    'lib',
+    'pubspec.yaml',
+    'android/gradle.properties',
+    'android/build.gradle',
+    'android/build.gradle.kts',
+    'android/settings.gradle',
+    'android/settings.gradle.kts',
+    'android/app/build.gradle',
+    'android/app/build.gradle.kts',
+    'android/app/src/main/AndroidManifest.xml',
+    'android/app/src/main/kotlin',
+    'android/app/src/main/java',
+]
+
+WARM_PUBSPEC_DEPENDENCIES = {
+    'flutter_blue_plus': '^1.36.8',
+    'permission_handler': '^11.3.1',
+}
+
+
+class Workspace:
+    def __init__(self, index: int, name: str, path: str, baseline_dir: str):
+        self.index = index
+        self.name = name
+        self.path = path
+        self.baseline_dir = baseline_dir
+
+
+class WorkspacePool:
+    """Pool of Flutter projects that have already run pub get and a release build."""
+
+    def __init__(self, size: int = None, root: str = None):
+        self.size = BuildConfig.WORKSPACE_POOL_SIZE if size is None else size
+        self.root = root or BuildConfig.WORKSPACE_POOL_DIR
+        self._available = queue.Queue()
+        self._started = False
+        self._lock = threading.Lock()
+
+    def warm_up(self):
+        """Prepare all workspaces in the background; checkouts succeed as soon as one is ready."""
+        with self._lock:
+            if self._started or self.size <= 0:
+                return
+            self._started = True
+
+        def _prepare_all():
+            for index in range(self.size):
+                try:
+                    self._available.put(self._prepare(index))
+                except Exception as e:
+                    print(f"⚠️ Could not warm build workspace {index}: {e}")
+
+        threading.Thread(target=_prepare_all, name='workspace-warmup', daemon=True).start()
+
+    def checkout(self, timeout: float = None):
+        """Take a warm workspace, or return None so the caller builds cold."""
+        if self.size <= 0:
+            return None
+        try:
+            return self._available.get(timeout=BuildConfig.WORKSPACE_CHECKOUT_TIMEOUT if timeout is None else timeout)
+        except queue.Empty:
+            return None
+
+    def release(self, workspace: Workspace, warm: bool = True):
+        """Reset session-owned files to the warm baseline and return the workspace.
+
+        Pass warm=False after a failed build or a flutter clean: the workspace's build state
+        can no longer be trusted, so it is rebuilt from scratch in the background instead.
+        """
+        if not warm:
+            print(f"♻️ Re-warming build workspace {workspace.name} after a cold or failed build")
+            threading.Thread(target=self._rewarm, args=(workspace,), name='workspace-rewarm', daemon=True).start()
+            return
+        try:
+            self._sync_paths(workspace.baseline_dir, workspace.path)
+            self._available.put(workspace)
+        except Exception as e:
+            print(f"⚠️ Dropping build workspace {workspace.name} after failed reset: {e}")
+
+    def load_session(self, workspace: Workspace, project_path: str):
+        """Copy the session's sources and config into the workspace, touching only changed files."""
+        self._sync_paths(project_path, workspace.path)
+
+    def _rewarm(self, workspace: Workspace):
+        shutil.rmtree(workspace.baseline_dir, ignore_errors=True)
+        try:
+            self._available.put(self._prepare(workspace.index))
+        except Exception as e:
+            print(f"⚠️ Could not re-warm build workspace {workspace.name}: {e}")
+
+    def _prepare(self, index: int) -> Workspace:
+        name = f'workspace_app_{index}'
+        path = os.path.join(self.root, name)
+        baseline_dir = os.path.join(self.root, f'{name}.baseline')
+
+        # The baseline only holds session-owned files; without the workspace itself it cannot restore a project
+        if not os.path.isdir(baseline_dir) or not os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+            shutil.rmtree(baseline_dir, ignore_errors=True)
+            os.makedirs(self.root, exist_ok=True)
+            print(f"🔥 Warming build workspace {name}...")
+            skeleton_cache.clone(name, path)
+            self._write_warm_pubspec(path, name)
+
+            ensure_dependencies(path, timeout=300)
+            with build_executor.admit(name):
+                result = run_flutter(['build', 'apk', '--release', '--no-pub'], cwd=path, timeout=1200,
+                                     env=gradle_env())
+            if result.returncode != 0:
+                raise Exception(f"Warm-up build failed: {result.stdout[-2000:]}")
+
+            staging_dir = baseline_dir + '.tmp'
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            self._sync_paths(path, staging_dir)
+            os.rename(staging_dir, baseline_dir)
+        else:
+            # Left over from a previous run: make sure no session files are still in place
+            self._sync_paths(baseline_dir, path)
+
+        print(f"✅ Build workspace {name} is warm")
+        return Workspace(index, name, path, baseline_dir)
+
+    def _write_warm_pubspec(self, path: str, name: str):
+        lines = [
+            f"name: {name}", "description: A Flutter application.",
+            "publish_to: 'none'", "version: 1.0.0+1", "",
+            "environment:", '  sdk: ">=3.2.0 <4.0.0"', "", "dependencies:",
+            "  flutter:", "    sdk: flutter",
+        ]
+        lines.extend(f"  {dep}: {version}" for dep, version in WARM_PUBSPEC_DEPENDENCIES.items())
+        lines.extend(["", "flutter:", "  uses-material-design: true", ""])
+        with open(os.path.join(path, 'pubspec.yaml'), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines))
+
+    def _sync_paths(self, source_root: str, dest_root: str):
+        for rel_path in SESSION_OWNED_PATHS:
+            source = os.path.join(source_root, rel_path)
+            dest = os.path.join(dest_root, rel_path)
+            if os.path.isdir(source):
+                self._sync_tree(source, dest)
+            elif os.path.isfile(source):
+                self._sync_file(source, dest)
+            elif os.path.isdir(dest):
+                shutil.rmtree(dest)
+            elif os.path.exists(dest):
+                os.remove(dest)
+
+    def _sync_tree(self, source: str, dest: str):
+        os.makedirs(dest, exist_ok=True)
+        source_entries = set(os.listdir(source))
+        for name in os.listdir(dest):
+            if name not in source_entries:
+                stale = os.path.join(dest, name)
+                if os.path.isdir(stale):
+                    shutil.rmtree(stale)
+                else:
+                    os.remove(stale)
+        for name in source_entries:
+            child_source = os.path.join(source, name)
+            child_dest = os.path.join(dest, name)
+            if os.path.isdir(child_source):
+                if os.path.isfile(child_dest):
+                    os.remove(child_dest)
+                self._sync_tree(child_source, child_dest)
+            else:
+                if os.path.isdir(child_dest):
+                    shutil.rmtree(child_dest)
+                self._sync_file(child_source, child_dest)
+
+    def _sync_file(self, source: str, dest: str):
+        # Unchanged files keep their mtime so Gradle and the Dart frontend treat them as up to date
+        if os.path.isfile(dest) and filecmp.cmp(source, dest, shallow=False):
+            return
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        shutil.copyfile(source, dest)
+
+
+workspace_pool = WorkspacePool()
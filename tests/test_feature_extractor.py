@@ -0,0 +1,23 @@
+from services.feature_extractor import extract_features, guess_device, match_tags
+
+
+def test_hardware_command_names_attribute_their_device():
+    prompt = extract_features('temperature monitor')
+    assert guess_device(prompt, extract_features('button "Turn On": sends "RELAY_START"')) == 'relay'
+    assert guess_device(prompt, extract_features('button "Glow": sends "NEOPIXEL_ON"')) == 'neopixel'
+    assert guess_device(prompt, extract_features('button "Beep": sends "BUZZER_1"')) == 'buzzer'
+
+
+def test_underscores_and_hyphens_separate_words():
+    assert 'device:relay' in match_tags('RELAY_STOP')
+    assert 'device:led' in match_tags('status-led')
+
+
+def test_multi_word_phrases_do_not_span_punctuation():
+    assert 'light_sensor' in match_tags('an ambient  light\nsensor')
+    assert 'light_sensor' not in match_tags('a light, sensor data')
+
+
+def test_inflections_and_embedded_words():
+    assert 'device:led' in match_tags('two leds')
+    assert 'device:led' not in match_tags('a ledger')